@@ -0,0 +1,135 @@
+"""
+生成処理のベンチマークスクリプト
+
+従来の1セルずつの生成処理と、generator.py の一括生成処理の速度を比較する。
+CSV の書き出しは、従来の main() の書き出し方と CsvOutput を比較する。
+
+使い方:
+    python bench.py [対象 ...] [--rows N]
+
+対象を省略した場合はすべてのベンチマークを実行する。
+"""
+
+import argparse
+import csv
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict
+
+import generator
+
+
+def _measure(label: str, func: Callable[[], object], rows: int) -> float:
+    """
+    関数を1回実行して経過時間を表示する。
+
+    Args:
+        label: 表示名
+        func: 計測対象の関数
+        rows: 生成件数（スループット表示用）
+
+    Returns:
+        経過秒数
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {elapsed:8.3f}s  {rows / elapsed:14,.0f} rows/s")
+    return elapsed
+
+
+def bench_uuid(rows: int) -> None:
+    """
+    uuid 型: uuid.uuid4() を1件ずつ呼ぶ従来の方法と UUIDGenerator を比較する。
+    """
+    print(f"[uuid] {rows:,} rows")
+    base = _measure("per-cell str(uuid.uuid4())", lambda: [str(uuid.uuid4()) for _ in range(rows)], rows)
+
+    bulk = generator.UUIDGenerator()
+    fast = _measure("UUIDGenerator.take (column)", lambda: bulk.take(rows), rows)
+
+    single = generator.UUIDGenerator()
+    row = _measure("UUIDGenerator.next (row)", lambda: [single.next() for _ in range(rows)], rows)
+
+    seeded = generator.UUIDGenerator(lambda size: generator.STREAMS["uuid"].words(size // 16, lanes=2).tobytes())
+    _measure("UUIDGenerator.take (seeded RNG)", lambda: seeded.take(rows), rows)
+    print(f"  speedup: column {base / fast:.1f}x, row {base / row:.1f}x")
+
+
+CSV_SCHEMA = {
+    "table_name": "bench_csv",
+    "type": "transactional",
+    "count": 0,
+    "fields": {
+        "slip_number": {"type": "code", "pattern": "SLIP-{seq:8}"},
+        "slip_id": {"type": "uuid"},
+        "quantity": {"type": "int", "min": 1, "max": 100},
+        "amount": {"type": "int", "min": 0, "max": 10_000_000},
+        "shipment_date": {"type": "date", "nullable": True},
+        "status": {"type": "const", "value": "OPEN"},
+    },
+}
+
+
+def bench_csv(rows: int) -> None:
+    """
+    CSV 書き出し: 従来の main() の書き出し（行の辞書を csv.DictWriter で QUOTE_ALL）と、
+    列のまま文字列にまとめて書き出す CsvOutput を比較する。
+    """
+    print(f"[csv] {rows:,} rows")
+    schema = dict(CSV_SCHEMA, count=rows)
+    chunks = list(generator.iter_chunks(schema))
+    names = list(schema["fields"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.csv"
+
+        def dict_writer():
+            records = [dict(zip(names, row)) for chunk in chunks for row in generator.iter_rows(chunk)]
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=records[0].keys(), quoting=csv.QUOTE_ALL)
+                writer.writeheader()
+                writer.writerows(records)
+
+        def tuple_writer():
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+                writer.writerow(names)
+                for chunk in chunks:
+                    writer.writerows(generator.iter_rows(chunk))
+
+        types = {name: generator.ColumnType("string") for name in names}
+        base = _measure("csv.DictWriter QUOTE_ALL (main)", dict_writer, rows)
+        _measure("csv.writer tuples QUOTE_ALL", tuple_writer, rows)
+        fast = _measure("CsvOutput quoting=all", lambda: generator.CsvOutput().write(path, chunks, types), rows)
+        minimal = _measure("CsvOutput quoting=minimal", lambda: generator.CsvOutput("minimal", "\\N", "\n").write(path, chunks, types), rows)
+    print(f"  speedup: all {base / fast:.1f}x, minimal {base / minimal:.1f}x")
+
+
+BENCHMARKS: Dict[str, Callable[[int], None]] = {
+    "uuid": bench_uuid,
+    "csv": bench_csv,
+}
+
+
+def main() -> None:
+    """
+    コマンドライン引数で指定されたベンチマークを実行する。
+    """
+    parser = argparse.ArgumentParser(description="generator.py のベンチマーク")
+    parser.add_argument("targets", nargs="*", help=f"実行するベンチマーク（{', '.join(BENCHMARKS)}）")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="生成件数")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.targets if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"不明なベンチマーク: {', '.join(unknown)}")
+
+    for name in args.targets or BENCHMARKS:
+        BENCHMARKS[name](args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,44 @@
 import yaml
-import csv
-import random
-import uuid
+import argparse
+import io
+import json
+import queue
 import re
+import shutil
+import sqlite3
+import struct
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
 from pathlib import Path
-from datetime import datetime, timedelta
-from faker import Faker
-from collections import defaultdict
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import numpy as np
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections.abc import Mapping
+from itertools import chain
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet 形式で出力しない場合は不要
+    pa = pq = None
+try:
+    import zstandard
+except ImportError:  # zstd で圧縮しない場合は不要
+    zstandard = None
+try:
+    import orjson
+except ImportError:  # JSON Lines は標準の json モジュールでも書き出せる
+    orjson = None
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
 
 """
 データ生成スクリプト
@@ -24,17 +55,175 @@ output ディレクトリ内に CSV 形式で出力する。
 フィールド定義に応じたデータ型、参照整合性、連番やバージョン管理にも対応。
 """
 
-fake = Faker("ja_JP")
+NULL_RATE = 0.1
+CHUNK_SIZE = 100_000
+SHARD_SIZE = 1_000_000
+ROW_GROUP_SIZE = 1_000_000
+DICT_ENCODE_RATIO = 0.5
+
+AS_OF: Optional[datetime] = None
 
 DATA = {}
 AUTO_INC = defaultdict(int)
 SEQ_COUNTER = defaultdict(int)
+REF_POOLS = {}
+
+
+SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """
+    SplitMix64 の出力関数で、uint64 配列の各要素をその場でかき混ぜる。
+
+    Args:
+        x: uint64 の配列（上書きされる）
+
+    Returns:
+        かき混ぜた uint64 の配列（x と同じ配列）
+    """
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+class CounterStream:
+    """
+    カウンタ方式の乱数ストリーム。
+
+    position 番目の値は key と position だけから計算する（SplitMix64 の position 番目の出力）ため、
+    途中の値を生成しなくても任意の位置から引き始められる。
+    1回の呼び出しで n 件引くと position が n 進むので、1行につき1件ずつ引く列では
+    行 i の値が (key, i) だけで決まる。np.random.Generator のうち、この生成器が使う部分だけを持つ。
+
+    Args:
+        key: ストリームのキー
+        position: 最初に引く位置
+    """
+
+    __slots__ = ("key", "position")
+
+    def __init__(self, key: int, position: int = 0):
+        self.key = np.uint64(key)
+        self.position = position
+
+    def words(self, n: int, lanes: int = 1) -> np.ndarray:
+        """
+        n 件分の 64 ビット乱数を引く。1件あたり lanes 個の値を使う場合は (n, lanes) の配列を返す。
+
+        Args:
+            n: 件数
+            lanes: 1件あたりの値の数
+
+        Returns:
+            uint64 の配列
+        """
+        start = self.position * lanes
+        counters = np.arange(start + 1, start + n * lanes + 1, dtype=np.uint64)
+        self.position += n
+        counters *= SPLITMIX_GAMMA
+        counters += self.key
+        values = _mix64(counters)
+        return values if lanes == 1 else values.reshape(n, lanes)
+
+    def integers(self, low: int, high: Optional[int] = None, size: Optional[int] = None,
+                 endpoint: bool = False) -> Union[int, np.ndarray]:
+        """
+        low 以上 high 未満（endpoint=True の場合は high 以下）の整数を引く。
+
+        Args:
+            low: 最小値（high を省略した場合は 0 からの上限）
+            high: 上限
+            size: 件数（省略時は1件だけ int で返す）
+            endpoint: True の場合は high を含む
+
+        Returns:
+            int64 の配列、または int
+        """
+        if high is None:
+            low, high = 0, low
+        span = high - low + (1 if endpoint else 0)
+        if span <= 0:
+            raise ValueError(f"[ERROR] 乱数の範囲が不正です: low={low}, high={high}")
+        values = (self.words(1 if size is None else size) % np.uint64(span)).astype(np.int64) + low
+        return int(values[0]) if size is None else values
+
+    def random(self, size: Optional[int] = None) -> Union[float, np.ndarray]:
+        """
+        [0, 1) の浮動小数点数を引く。
+
+        Args:
+            size: 件数（省略時は1件だけ float で返す）
+
+        Returns:
+            float64 の配列、または float
+        """
+        values = (self.words(1 if size is None else size) >> np.uint64(11)) * (1.0 / (1 << 53))
+        return float(values[0]) if size is None else values
+
+
+class RandomStreams:
+    """
+    列ごとに独立した乱数ストリーム（CounterStream）の集まり。
+
+    ストリームのキーはシード・テーブル名・列名から導出するため、
+    ある列の乱数の消費量やフィールドの追加・削除が、他の列や他のテーブルの値をずらさない。
+    ストリームは position（行の位置）から引き始めるので、行 i の値はシード・テーブル名・列名・i だけで決まり、
+    任意の行範囲を、それより前の行を生成せずに作れる。
+
+    Args:
+        key: ストリームの導出に使う整数の列（省略時は OS のエントロピー）
+        position: 各ストリームが最初に引く位置
+    """
+
+    def __init__(self, key: Sequence[int] = (), position: int = 0):
+        self.key = [int(k) for k in key] or np.random.SeedSequence().generate_state(4).tolist()
+        self.position = position
+        self._streams: Dict[str, CounterStream] = {}
+
+    @classmethod
+    def for_table(cls, seed: int, table_name: str, position: int = 0) -> "RandomStreams":
+        """
+        シードとテーブル名に対応するストリームの集まりを作る。
+
+        Args:
+            seed: 乱数のシード
+            table_name: テーブル名
+            position: 各ストリームが最初に引く位置
+
+        Returns:
+            ストリームの集まり
+        """
+        return cls([seed, zlib.crc32(table_name.encode("utf-8"))], position)
+
+    def __getitem__(self, name: str) -> CounterStream:
+        stream = self._streams.get(name)
+        if stream is None:
+            entropy = [*self.key, zlib.crc32(name.encode("utf-8"))]
+            key = np.random.SeedSequence(entropy).generate_state(1, np.uint64)[0]
+            stream = self._streams[name] = CounterStream(key, self.position)
+        return stream
+
+
+STREAMS = RandomStreams()
+
+# 列以外の用途のストリーム名（フィールド名と衝突しないよう # を付ける）
+COUNT_STREAM = "#count"
+VERSION_STREAM = "#version"
 
 
 def generate_value(field_name: str, field_def: Dict[str, Any], context: Dict[str, Any]) -> Optional[Any]:
     """
     フィールド定義とコンテキスト情報に基づいて、1つのセルの値を生成する。
 
+    大量データの生成では compile_schema で事前コンパイルした生成計画を使うこと。
+    この関数は単発の値生成用に残している。コンパイルした生成計画は、フィールド名・定義・基準日時ごとに
+    直近 FIELD_PLAN_CACHE_SIZE 件まで残し、2回目以降の呼び出しでは生成関数を呼ぶだけにする。
+    ref フィールドでは、参照先の DATA のテーブルが置き換えられていれば ref プールを作り直す。
+
     Args:
         field_name: フィールド名
         field_def: フィールドの型や制約情報を含む定義
@@ -43,227 +232,4284 @@ def generate_value(field_name: str, field_def: Dict[str, Any], context: Dict[str
     Returns:
         生成された値（str, int, datetimeなど）
     """
-    if field_def.get("nullable", False) and random.random() < 0.1:
-        return None
-    if "default" in field_def:
-        return field_def["default"]
+    if field_def.get("type") == "ref":
+        _refresh_ref_pool(field_def["table"], field_def["field"])
+    return _field_plan(field_name, _freeze(field_def), AS_OF).generate(context)
 
-    ftype = field_def.get("type")
 
-    if ftype == "uuid":
-        return str(uuid.uuid4())
-    elif ftype == "const":
-        return field_def.get("value")
-    elif ftype == "int":
-        return random.randint(field_def.get("min", 0), field_def.get("max", 100))
-    elif ftype == "date":
-        return fake.date_between(start_date="-1y", end_date="today").isoformat()
-    elif ftype == "timestamp":
-        dt = fake.date_time_between(start_date="-1y", end_date="now")
-        return dt.strftime("%Y-%m-%dT%H:%M:%S")
-    elif ftype == "ref":
-        ref_table = field_def["table"]
-        ref_field = field_def["field"]
-        if ref_table not in DATA:
-            raise KeyError(f"[ERROR] refテーブル {ref_table} がまだ生成されていません")
-        return random.choice(DATA[ref_table])[ref_field]
-    elif ftype == "code":
-        pattern = field_def.get("pattern", "CODE-{seq:6}")
+FIELD_PLAN_CACHE_SIZE = 1024
+
+# ref プールを作った時点の DATA のテーブル（generate_value で置き換えを検出する）
+REF_POOL_SOURCES: Dict[Tuple[str, str], Any] = {}
+
+
+@lru_cache(maxsize=FIELD_PLAN_CACHE_SIZE)
+def _field_plan(field_name: str, frozen: Any, as_of: Optional[datetime]) -> "FieldPlan":
+    """_freeze したフィールド定義をコンパイルする（as_of はキャッシュのキーにだけ使う）。"""
+    return compile_field(field_name, _thaw(frozen))
+
+
+def _refresh_ref_pool(ref_table: str, ref_field: str) -> None:
+    """
+    ref プールを作った後に DATA のテーブルが置き換えられていれば、古い ref プールを捨てる。
+
+    Args:
+        ref_table: 参照先テーブル名
+        ref_field: 参照先フィールド名
+    """
+    table = DATA.get(ref_table)
+    key = (ref_table, ref_field)
+    if table is None or REF_POOL_SOURCES.get(key) is table:
+        return
+    REF_POOLS.pop(key, None)
+    REF_POOL_SOURCES[key] = table
+
+
+def _freeze(value: Any) -> Any:
+    """辞書・リストを含むフィールド定義を、キャッシュのキーに使えるタプルに変換する（_thaw で元に戻せる）。"""
+    if isinstance(value, Mapping):
+        return (dict, tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (list, tuple(_freeze(v) for v in value))
+    return value
 
-        def replace(m):
+
+def _thaw(value: Any) -> Any:
+    """_freeze で変換した値を、辞書・リストに戻す。"""
+    if isinstance(value, tuple) and value and value[0] is dict:
+        return {k: _thaw(v) for k, v in value[1]}
+    if isinstance(value, tuple) and value and value[0] is list:
+        return [_thaw(v) for v in value[1]]
+    return value
+
+
+class FieldPlan(NamedTuple):
+    """
+    1フィールド分のコンパイル済み生成計画。
+
+    Attributes:
+        name: フィールド名
+        ftype: フィールド型（type の値）
+        generate: コンテキストを受け取り1セルの値を返す生成関数
+        column: 件数を受け取り1列分の値をまとめて返す生成関数（None の場合は generate を繰り返す）
+        constant: 全行で同じ値になる場合は True（一度だけ評価してブロードキャストする）
+        parent_field: 子テーブルで親レコードからコピーするフィールド名
+    """
+    name: str
+    ftype: Optional[str]
+    generate: Callable[[Dict[str, Any]], Any]
+    column: Optional[Callable[[int], Sequence]] = None
+    constant: bool = False
+    parent_field: Optional[str] = None
+
+    def generate_column(self, n: int) -> Sequence:
+        """
+        n 件分の値を1列としてまとめて生成する。
+
+        Args:
+            n: 生成件数
+
+        Returns:
+            値のリストまたは NumPy 配列
+        """
+        if self.constant:
+            return [self.generate({})] * n
+        if self.column is not None:
+            return self.column(n)
+        generate = self.generate
+        return [generate({}) for _ in range(n)]
+
+
+CODE_TOKEN = re.compile(r"\{(.*?)\}")
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ALPHABET_ARRAY = np.array(list(ALPHABET), dtype=object)
+
+
+class CodeTemplate:
+    """
+    code 型のパターンを一度だけ解析した生成テンプレート。
+
+    パターンはリテラル、連番スロット（`{seq:N}`）、英字スロット（`{alpha}`）に分解し、
+    % 演算子用の書式文字列にまとめる。`{date:...}` は生成開始時点の日付で固定して
+    リテラルに埋め込むため、値の生成は書式文字列への当てはめ1回で済む。
+
+    連番は SEQ_COUNTER[pattern] を共有し、1行でそのパターンを使う全フィールドの連番スロットの数（row_slots）だけ進む。
+    各フィールドは行内の決まった位置（offset）のスロットを使うため、n 行目の値は
+    `先頭 + offset + n * row_slots` になり、チャンクやシャードの区切り方によらない。
+    英字は英字スロットごとのストリーム（1つ目は STREAMS[stream]）から、1行につき1件ずつ引く。
+
+    Args:
+        pattern: `{seq:3}` などのトークンを含むパターン文字列
+        today: `{date:...}` に埋め込む日付（省略時は現在日時）
+        stream: 英字を引く乱数ストリームの名前（省略時はパターン文字列）
+        offset: 行内でこのフィールドの連番スロットが始まる位置（同じパターンの前のフィールドのスロット数の合計）
+        row_slots: 同じパターンを使う全フィールドの、1行あたりの連番スロット数（省略時はこのフィールドだけ）
+    """
+
+    def __init__(self, pattern: str, today: Optional[datetime] = None, stream: Optional[str] = None,
+                 offset: int = 0, row_slots: Optional[int] = None):
+        today = today or AS_OF or datetime.today()
+        self.pattern = pattern
+        self.stream = stream or pattern
+        self.slots: List[str] = []
+        parts = []
+        pos = 0
+        for m in CODE_TOKEN.finditer(pattern):
+            parts.append(self._escape(pattern[pos:m.start()]))
             token = m.group(1)
             if token.startswith("date:"):
-                return datetime.today().strftime(token.split(":", 1)[1])
+                parts.append(self._escape(today.strftime(token.split(":", 1)[1])))
             elif token.startswith("seq:"):
                 width = int(token.split(":")[1])
-                SEQ_COUNTER[pattern] += 1
-                return str(SEQ_COUNTER[pattern]).zfill(width)
+                parts.append(f"%0{width}d")
+                self.slots.append("seq")
             elif token == "alpha":
-                return random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
-            return f"<UNKNOWN:{token}>"
+                parts.append("%s")
+                self.slots.append("alpha")
+            else:
+                parts.append(self._escape(f"<UNKNOWN:{token}>"))
+            pos = m.end()
+        parts.append(self._escape(pattern[pos:]))
+        self.format = "".join(parts)
+        self.seq_slots = self.slots.count("seq")
+        self.offset = offset
+        self.row_slots = self.seq_slots if row_slots is None else row_slots
 
-        return re.sub(r"\{(.*?)\}", replace, pattern)
-    elif ftype == "version_sequence":
-        return context.get("__version__", 1)
-    elif ftype == "auto_increment":
-        key = field_name
-        AUTO_INC[key] += 1
-        return AUTO_INC[key]
+    @staticmethod
+    def _escape(text: str) -> str:
+        """% 演算子の書式文字列に埋め込めるよう、% をエスケープする。"""
+        return text.replace("%", "%%")
+
+    def render(self, first_seq: int, n: int) -> List[str]:
+        """
+        連番 first_seq から始まる n 件分のコードをまとめて生成する（SEQ_COUNTER は進めない）。
+
+        Args:
+            first_seq: 1件目の最初の連番スロットに入る値（2件目以降は row_slots ずつ進む）
+            n: 生成件数
 
-    return None
+        Returns:
+            コード文字列のリスト
+        """
+        fmt = self.format
+        if not self.slots:
+            return [fmt % ()] * n
+        step = self.row_slots
+        args = []
+        seq = first_seq
+        alpha = 0
+        for slot in self.slots:
+            if slot == "seq":
+                args.append(range(seq, seq + step * n, step))
+                seq += 1
+            else:
+                stream = STREAMS[self.stream if not alpha else f"{self.stream}#{alpha}"]
+                args.append(ALPHABET_ARRAY[stream.integers(0, len(ALPHABET), size=n)].tolist())
+                alpha += 1
+        if len(args) == 1:
+            return [fmt % value for value in args[0]]
+        return [fmt % values for values in zip(*args)]
 
+    def take(self, n: int) -> List[str]:
+        """
+        SEQ_COUNTER の続きから n 行分のコードを生成する。
 
-def generate_rows(schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+        同じパターンのフィールドはチャンクごとにフィールド順に呼ばれる前提で、行内の最後のスロットを
+        使うフィールドが、n 行分（n * row_slots）だけカウンタを進める。
+
+        Args:
+            n: 生成件数
+
+        Returns:
+            コード文字列のリスト
+        """
+        first = SEQ_COUNTER[self.pattern] + 1 + self.offset
+        if self.offset + self.seq_slots == self.row_slots:
+            SEQ_COUNTER[self.pattern] += self.row_slots * n
+        return self.render(first, n)
+
+    def next(self) -> str:
+        """
+        コードを1件生成する（行単位での利用向け）。
+
+        行ごとにフィールド順に呼べば、同じパターンのフィールドが行内で続きの連番を使うため、
+        take と同じ値になる。
+
+        Returns:
+            コード文字列
+        """
+        first = SEQ_COUNTER[self.pattern] + 1
+        SEQ_COUNTER[self.pattern] += self.seq_slots
+        return self.render(first, 1)[0]
+
+
+def collect_ref_fields(schemas: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
     """
-    単一スキーマに基づいて、複数行のデータレコードを生成する。
+    ref フィールドからランダムに参照される (テーブル, フィールド) の組を集める。
 
     Args:
-        schema: テーブル定義を含む辞書（type, fields, countなど）
+        schemas: スキーマ定義のリスト
 
     Returns:
-        生成されたレコードのリスト（辞書のリスト）
+        参照先テーブル名をキー、参照されるフィールド名の集合を値とする辞書
     """
-    if "records" in schema:
-        return schema["records"]
+    ref_fields = defaultdict(set)
+    for schema in schemas:
+        for field_def in schema.get("fields", {}).values():
+            # 親テーブルへの ref は親レコードからコピーするため、プールは不要
+            if isinstance(field_def, dict) and field_def.get("type") == "ref" and field_def["table"] != schema.get("parent"):
+                ref_fields[field_def["table"]].add(field_def["field"])
+    return dict(ref_fields)
 
-    rows = []
-    table_type = schema["type"]
 
-    fields = schema.get("fields", {})
-    if table_type != "pointer":
-        fields = schema["fields"]
-
-    if table_type == "master":
-        for _ in range(schema["count"]):
-            row = {}
-            for name, fdef in fields.items():
-                row[name] = generate_value(name, fdef, context=row)
-            rows.append(row)
-
-    elif table_type in ("immutable", "transactional") and "parent" in schema:
-        parent_table = schema["parent"]
-        parent_key_fields = schema.get("parent_key", [])
-        if isinstance(parent_key_fields, str):
-            parent_key_fields = [parent_key_fields]
-        parents = DATA[parent_table]
-        count_range = schema.get("count_per_parent", "1").split("~")
-        minc = int(count_range[0])
-        maxc = int(count_range[-1]) if len(count_range) > 1 else minc
-
-        for parent in parents:
-            AUTO_INC.clear()
-            for _ in range(random.randint(minc, maxc)):
-                row = {}
-                for name, fdef in fields.items():
-                    ctx = {**row, **parent}
-                    if fdef.get("type") == "ref" and fdef["table"] == parent_table and fdef["field"] in parent:
-                        row[name] = parent[fdef["field"]]
-                    elif fdef.get("type") == "version_sequence":
-                        row[name] = parent.get("version", 1)
-                    else:
-                        row[name] = generate_value(name, fdef, context=ctx)
-                rows.append(row)
+def build_ref_pools(table_name: str, table: Mapping[str, Sequence], fields: Iterable[str]) -> None:
+    """
+    生成し終えたテーブルから、参照される列ごとの値配列（ref プール）を作る。
 
-    elif table_type == "immutable":
-        version_range = schema.get("version_range", "1").split("~")
-        minv = int(version_range[0])
-        maxv = int(version_range[-1]) if len(version_range) > 1 else minv
-        for _ in range(schema["count"]):
-            base_row = {
-                name: generate_value(name, fdef, context={})
-                for name, fdef in fields.items()
-                if fdef.get("type") != "version_sequence"
-            }
-            versions = random.randint(minv, maxv)
-            for v in range(1, versions + 1):
-                context = {"__version__": v, **base_row}
-                row = dict(base_row)
-                for name, fdef in fields.items():
-                    if fdef.get("type") == "version_sequence":
-                        row[name] = generate_value(name, fdef, context)
-                rows.append(row)
-
-    elif table_type == "transactional":
-        for _ in range(schema["count"]):
-            row = {}
-            for name, fdef in fields.items():
-                row[name] = generate_value(name, fdef, context=row)
-            rows.append(row)
+    同じ列を参照するフィールドが複数あっても、プールは (テーブル, フィールド) ごとに1つだけ作り共有する。
+    ColumnTable の列はそのまま共有し、それ以外は encode_column で詰めて保持する。
 
-    elif table_type == "pointer":
-        source_table = schema["source_table"]
-        key_fields = schema["key"]
-        latest_field = schema["latest_field"]
+    Args:
+        table_name: テーブル名
+        table: 列名をキーとする列の辞書、または ColumnTable
+        fields: プールを作るフィールド名
+    """
+    for field in fields:
+        if isinstance(table, ColumnTable):
+            REF_POOLS[(table_name, field)] = table.columns[field]
+        else:
+            REF_POOLS[(table_name, field)] = encode_column(table[field])
 
-        group = defaultdict(list)
-        for row in DATA[source_table]:
-            key = tuple(row[k] for k in key_fields)
-            group[key].append(row)
 
-        for versions in group.values():
-            sorted_versions = sorted(versions, key=lambda r: r[latest_field], reverse=True)
-            latest = sorted_versions[0]
-            rows.append({k: latest[k] for k in latest})
+def _ref_pool(ref_table: str, ref_field: str) -> "StoredColumn":
+    """
+    ref プールを返す。まだ作られていなければ DATA から作る。
 
-    return rows
+    Args:
+        ref_table: 参照先テーブル名
+        ref_field: 参照先フィールド名
+
+    Returns:
+        参照先の列
+    """
+    pool = REF_POOLS.get((ref_table, ref_field))
+    if pool is None:
+        table = DATA.get(ref_table)
+        if table is None:
+            raise KeyError(f"[ERROR] refテーブル {ref_table} がまだ生成されていません")
+        build_ref_pools(ref_table, table, [ref_field])
+        pool = REF_POOLS[(ref_table, ref_field)]
+    if len(pool) == 0:
+        raise ValueError(f"[ERROR] refテーブル {ref_table} にレコードがありません")
+    return pool
 
 
-def resolve_dependencies(schemas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _ref_column(ref_table: str, ref_field: str, stream: str) -> Callable[[int], np.ndarray]:
     """
-    スキーマ間の依存関係を解析し、正しい順序に並べ替える。
+    ref 型の列生成関数を作る。ref プールに対するインデックスを1列分まとめて引く。
 
     Args:
-        schemas: スキーマ定義のリスト
+        ref_table: 参照先テーブル名
+        ref_field: 参照先フィールド名
+        stream: 乱数ストリームの名前
 
     Returns:
-        依存関係順にソートされたスキーマ定義のリスト
+        件数を受け取り参照先の値の配列を返す生成関数
     """
-    graph = defaultdict(set)
-    name_to_schema = {}
+    def column(n):
+        if not n:
+            return np.empty(0, dtype=object)
+        pool = _ref_pool(ref_table, ref_field)
+        return pool.take(STREAMS[stream].integers(0, len(pool), size=n))
 
-    for schema in schemas:
-        name = schema["table_name"]
-        name_to_schema[name] = schema
+    return column
 
-        # 全てのref依存を検出
-        for field_def in schema.get("fields", {}).values():
-            if isinstance(field_def, dict) and field_def.get("type") == "ref":
-                ref_table = field_def["table"]
-                graph[name].add(ref_table)
 
-        if "parent" in schema:
-            graph[name].add(schema["parent"])
+UUID_HEX_POSITIONS = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
 
-        if schema["type"] == "pointer":
-            graph[name].add(schema["source_table"])
 
-    visited = set()
-    sorted_schemas = []
+def format_uuids(raw: np.ndarray) -> List[str]:
+    """
+    16バイトずつの乱数を UUID v4 の文字列表現へまとめて変換する。
 
-    def visit(n):
-        if n in visited:
-            return
-        for dep in graph.get(n, []):
-            visit(dep)
-        visited.add(n)
-        sorted_schemas.append(name_to_schema[n])
+    バージョン（4）とバリアント（RFC 4122）のビットをここで設定し、
+    16進数化とハイフンの挿入は配列演算で一度に行う。
 
-    for name in name_to_schema:
-        visit(name)
+    Args:
+        raw: 形状 (n, 16) の uint8 配列（内容は書き換えられる）
 
-    return sorted_schemas
+    Returns:
+        `xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx` 形式の文字列のリスト
+    """
+    n = len(raw)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    digits = np.empty((n, 32), dtype=np.uint8)
+    digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+    chars = np.full((n, 36), ord("-"), dtype=np.uint8)
+    chars[:, UUID_HEX_POSITIONS] = digits
+    text = chars.tobytes().decode("ascii")
+    return [text[i:i + 36] for i in range(0, 36 * n, 36)]
 
 
-def main() -> None:
+class UUIDGenerator:
     """
-    スキーマファイルを読み込み、順にデータを生成して CSV に出力するメイン関数。
+    UUID v4 をブロック単位でまとめて生成するジェネレータ。
+
+    乱数バイトは block_size 件分ずつ一度に読み出して整形するため、
+    uuid.uuid4() のような1件ごとのシステムコールやオブジェクト生成が発生しない。
+    random_bytes にシード済みの乱数生成器を渡せば、出力を再現できる。
+
+    Args:
+        random_bytes: 指定バイト数の乱数を返す関数（省略時は os.urandom）
+        block_size: 1回の読み出しで生成する UUID の件数
     """
-    schema_dir = Path("schema")
-    output_dir = Path("output")
-    output_dir.mkdir(exist_ok=True)
 
-    schemas = []
-    for schema_file in sorted(schema_dir.glob("*.yaml")):
-        with open(schema_file, encoding="utf-8") as f:
-            schema = yaml.safe_load(f)
-            schemas.append(schema)
+    def __init__(self, random_bytes: Optional[Callable[[int], bytes]] = None, block_size: int = 65536):
+        self.random_bytes = random_bytes or os.urandom
+        self.block_size = block_size
+        self._buffer: List[str] = []
+        self._pos = 0
 
-    for schema in resolve_dependencies(schemas):
-        table_name = schema["table_name"]
-        print(f"[INFO] Generating table: {table_name}")
-        rows = generate_rows(schema)
-        DATA[table_name] = rows
+    def _draw(self, n: int) -> List[str]:
+        """n 件分の乱数バイトを読み出し、UUID 文字列に整形する。"""
+        raw = np.frombuffer(self.random_bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+        return format_uuids(raw)
+
+    def next(self) -> str:
+        """
+        UUID を1件返す（行単位での利用向け）。
+
+        Returns:
+            UUID 文字列
+        """
+        if self._pos >= len(self._buffer):
+            self._buffer = self._draw(self.block_size)
+            self._pos = 0
+        value = self._buffer[self._pos]
+        self._pos += 1
+        return value
+
+    def take(self, n: int) -> List[str]:
+        """
+        UUID を n 件まとめて返す（列単位での利用向け）。
+
+        先に行単位で読み出したブロックの残りがあれば、それから使う。
+
+        Args:
+            n: 生成件数
+
+        Returns:
+            UUID 文字列のリスト
+        """
+        rest = self._buffer[self._pos:self._pos + n]
+        self._pos += len(rest)
+        if len(rest) == n:
+            return rest
+        values = rest
+        remaining = n - len(rest)
+        while remaining > 0:
+            size = min(remaining, self.block_size)
+            values += self._draw(size)
+            remaining -= size
+        return values
+
+
+RELATIVE_SPEC = re.compile(r"(?:[+-]?\d+[yMwdhms])+")
+RELATIVE_TERM = re.compile(r"([+-]?\d+)([yMwdhms])")
+RELATIVE_UNIT_SECONDS = {
+    "y": 365.25 * 86400,
+    "M": 30.42 * 86400,
+    "w": 7 * 86400,
+    "d": 86400,
+    "h": 3600,
+    "m": 60,
+    "s": 1,
+}
+
+
+def resolve_anchor(spec: Any, as_of: datetime) -> datetime:
+    """
+    日付範囲の端点指定を日時に解決する。
+
+    指定できる形式:
+    - `now` / `today`: 基準日時そのもの
+    - `-1y`, `+30d`, `-1y6M` などの相対指定: 基準日時からの差分（y, M, w, d, h, m, s）。符号は次の符号までの項に掛かる
+    - `2024-01-01`, `2024-01-01T09:00:00` などの ISO 形式（YAML の日付型も可）
+
+    Args:
+        spec: 端点の指定
+        as_of: 相対指定の基準日時
+
+    Returns:
+        解決した日時
+    """
+    if isinstance(spec, datetime):
+        return spec
+    if isinstance(spec, date):
+        return datetime.combine(spec, datetime.min.time())
+    text = str(spec).strip()
+    if text in ("now", "today"):
+        return as_of
+    if RELATIVE_SPEC.fullmatch(text):
+        # 符号は次に符号が現れるまでの項に掛かる（`-1y6M` は1年6か月前）
+        seconds = 0.0
+        sign = 1
+        for n, unit in RELATIVE_TERM.findall(text):
+            if n[0] in "+-":
+                sign = -1 if n[0] == "-" else 1
+            seconds += sign * abs(int(n)) * RELATIVE_UNIT_SECONDS[unit]
+        return as_of + timedelta(seconds=seconds)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"[ERROR] 日付の指定を解釈できません: {spec}") from None
+
+
+def resolve_date_range(field_def: Dict[str, Any], unit: str) -> Tuple[int, int]:
+    """
+    date / timestamp フィールドの範囲を、エポックからの整数値の範囲に解決する。
+
+    start / end / as_of の解釈はフィールドごとに一度だけ行う。
+
+    Args:
+        field_def: フィールド定義（start, end, as_of を参照）
+        unit: "D"（日単位）または "s"（秒単位）
+
+    Returns:
+        (最小値, 最大値)。どちらも範囲に含む
+    """
+    now = AS_OF or datetime.now()
+    as_of = resolve_anchor(field_def["as_of"], now) if "as_of" in field_def else now
+    start = resolve_anchor(field_def.get("start", "-1y"), as_of)
+    end = resolve_anchor(field_def.get("end", "now"), as_of)
+    low = int(np.datetime64(start, unit).astype(np.int64))
+    high = int(np.datetime64(end, unit).astype(np.int64))
+    if low > high:
+        raise ValueError(f"[ERROR] 日付範囲の start が end より後になっています: {start} > {end}")
+    return low, high
+
+
+@lru_cache(maxsize=None)
+def _time_of_day_labels() -> np.ndarray:
+    """`THH:MM:SS` 形式の文字列を1日の秒数分だけ用意し、使い回す。"""
+    return np.array([f"T{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)], dtype=object)
+
+
+def _day_labels(low: int, high: int) -> np.ndarray:
+    """
+    日数範囲の各日の `YYYY-MM-DD` 文字列を一度にまとめて作る。
+
+    Args:
+        low: 最小の日数（エポックからの日数）
+        high: 最大の日数（エポックからの日数）
+
+    Returns:
+        日付文字列の object 配列（インデックスは low からのオフセット）
+    """
+    return np.datetime_as_string(np.arange(low, high + 1).astype("datetime64[D]")).astype(object)
+
+
+def _date_column(low: int, high: int, stream: str) -> Callable[[int], np.ndarray]:
+    """
+    date 型の列生成関数を作る。日数のオフセットを一度に引き、整形済みの文字列表から取り出す。
+
+    Args:
+        low: 最小の日数（エポックからの日数）
+        high: 最大の日数（エポックからの日数）
+        stream: 乱数ストリームの名前
+
+    Returns:
+        件数を受け取り日付文字列の配列を返す生成関数
+    """
+    labels = _day_labels(low, high)
+    return lambda n: labels[STREAMS[stream].integers(0, high - low, size=n, endpoint=True)]
+
+
+def _timestamp_column(low: int, high: int, stream: str) -> Callable[[int], np.ndarray]:
+    """
+    timestamp 型の列生成関数を作る。秒数を一度に引き、日付部分と時刻部分を
+    それぞれ整形済みの文字列表から取り出して連結する。
+
+    Args:
+        low: 最小の秒数（エポックからの秒数）
+        high: 最大の秒数（エポックからの秒数）
+        stream: 乱数ストリームの名前
+
+    Returns:
+        件数を受け取り `YYYY-MM-DDTHH:MM:SS` 形式の文字列の配列を返す生成関数
+    """
+    first_day = low // 86400
+    days = _day_labels(first_day, high // 86400)
+    times = _time_of_day_labels()
+
+    def column(n):
+        seconds = STREAMS[stream].integers(low, high, size=n, endpoint=True)
+        day, second = np.divmod(seconds, 86400)
+        return days[day - first_day] + times[second]
+
+    return column
+
+
+def _int_column(low: int, high: int, stream: str) -> Callable[[int], np.ndarray]:
+    """
+    int 型の列生成関数を作る。1列分を1回のベクトル化された乱数生成で得る。
+
+    Args:
+        low: 最小値（含む）
+        high: 最大値（含む）
+        stream: 乱数ストリームの名前
+
+    Returns:
+        件数を受け取り int64 配列を返す生成関数
+    """
+    return lambda n: STREAMS[stream].integers(low, high, size=n, endpoint=True)
+
+
+def _auto_increment_column(field_name: str) -> Callable[[int], np.ndarray]:
+    """
+    auto_increment 型の列生成関数を作る。AUTO_INC の続きから n 件分の連番を返す。
+
+    Args:
+        field_name: フィールド名（AUTO_INC のキー）
+
+    Returns:
+        件数を受け取り int64 配列を返す生成関数
+    """
+    def column(n):
+        start = AUTO_INC[field_name]
+        AUTO_INC[field_name] = start + n
+        return np.arange(start + 1, start + n + 1)
+
+    return column
+
+
+def _object_array(values: Sequence) -> np.ndarray:
+    """
+    列を object 型の NumPy 配列に変換する（None を代入できるようにするため）。
+
+    Args:
+        values: 元の列
+
+    Returns:
+        object 型の配列（元の列とは別のコピー）
+    """
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _as_list(values: Sequence) -> list:
+    """
+    列を Python のリストに変換する。NumPy 配列は Python の値に戻す。
+
+    Args:
+        values: 元の列
+
+    Returns:
+        値のリスト
+    """
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def _with_nulls(column: Callable[[int], Sequence], stream: str) -> Callable[[int], Sequence]:
+    """
+    列生成関数を、列ごとに1回だけ作る null マスクで包む。
+
+    Args:
+        column: 元の列生成関数
+        stream: null マスクを引く乱数ストリームの名前
+
+    Returns:
+        約 NULL_RATE の割合で None を含む列を返す生成関数
+    """
+    def nullable_column(n):
+        values = column(n)
+        mask = STREAMS[stream].random(n) < NULL_RATE
+        if not mask.any():
+            return values
+        values = _object_array(values)
+        values[mask] = None
+        return values
+
+    return nullable_column
+
+
+def compile_field(field_name: str, field_def: Dict[str, Any], seq_layout: Tuple[int, Optional[int]] = (0, None)) -> FieldPlan:
+    """
+    フィールド定義を、型ごとに特化した生成関数へコンパイルする。
+
+    nullable / default の判定と型による分岐はここで一度だけ行い、
+    行生成時には返された生成関数を呼ぶだけにする。
+
+    Args:
+        field_name: フィールド名
+        field_def: フィールドの型や制約情報を含む定義
+        seq_layout: code 型の (行内の連番スロットの位置, 1行あたりの連番スロット数)（_seq_layout の結果）
+
+    Returns:
+        フィールドの生成計画
+    """
+    ftype = field_def.get("type")
+    column = None
+    constant = False
+
+    if "default" in field_def:
+        default = field_def["default"]
+        generate = lambda ctx: default
+        constant = True
+    elif ftype == "uuid":
+        uuids = UUIDGenerator(lambda size: STREAMS[field_name].words(size // 16, lanes=2).tobytes())
+        generate = lambda ctx: uuids.next()
+        column = uuids.take
+    elif ftype == "const":
+        value = field_def.get("value")
+        generate = lambda ctx: value
+        constant = True
+    elif ftype == "int":
+        column = _int_column(field_def.get("min", 0), field_def.get("max", 100), field_name)
+        generate = lambda ctx: int(column(1)[0])
+    elif ftype in ("date", "timestamp"):
+        if ftype == "date":
+            column = _date_column(*resolve_date_range(field_def, "D"), field_name)
+        else:
+            column = _timestamp_column(*resolve_date_range(field_def, "s"), field_name)
+        generate = lambda ctx: column(1)[0]
+    elif ftype == "ref":
+        column = _ref_column(field_def["table"], field_def["field"], field_name)
+        generate = lambda ctx: column(1)[0]
+    elif ftype == "code":
+        template = CodeTemplate(field_def.get("pattern", "CODE-{seq:6}"), stream=field_name,
+                                offset=seq_layout[0], row_slots=seq_layout[1])
+        generate = lambda ctx: template.next()
+        column = template.take
+    elif ftype == "version_sequence":
+        generate = lambda ctx: ctx.get("__version__", 1)
+    elif ftype == "auto_increment":
+        def generate(ctx):
+            AUTO_INC[field_name] += 1
+            return AUTO_INC[field_name]
+        column = _auto_increment_column(field_name)
+    else:
+        generate = lambda ctx: None
+        constant = True
+
+    if field_def.get("nullable", False):
+        null_stream = f"{field_name}#null"
+        inner = generate
+        generate = lambda ctx: None if STREAMS[null_stream].random() < NULL_RATE else inner(ctx)
+        plan = FieldPlan(field_name, ftype, inner, column, constant)
+        column = _with_nulls(plan.generate_column, null_stream)
+        constant = False
+
+    return FieldPlan(field_name, ftype, generate, column, constant)
+
+
+def compile_schema(schema: Dict[str, Any]) -> List[FieldPlan]:
+    """
+    テーブル定義の fields を、フィールド順の生成計画リストにコンパイルする。
+
+    子テーブル（parent 指定あり）では、親テーブルを参照する ref と
+    version_sequence を親レコードからのコピーに置き換える。
+
+    Args:
+        schema: テーブル定義を含む辞書
+
+    Returns:
+        フィールドの生成計画のリスト（records / pointer の場合は空）
+    """
+    if "records" in schema or schema["type"] == "pointer":
+        return []
+
+    parent_table = schema.get("parent")
+    layout = _seq_layout(schema)
+    plan = []
+    for name, fdef in schema["fields"].items():
+        ftype = fdef.get("type")
+        if parent_table is not None and ftype == "ref" and fdef["table"] == parent_table:
+            ref_field = fdef["field"]
+            plan.append(FieldPlan(name, ftype, lambda parent, f=ref_field: parent[f], parent_field=ref_field))
+        elif parent_table is not None and ftype == "version_sequence":
+            plan.append(FieldPlan(name, ftype, lambda parent: parent.get("version", 1), parent_field="version"))
+        else:
+            plan.append(compile_field(name, fdef, layout.get(name, (0, None))))
+    return plan
+
+
+def compile_schemas(schemas: List[Dict[str, Any]]) -> Dict[str, List[FieldPlan]]:
+    """
+    依存関係順に並んだスキーマをまとめてコンパイルする。
+
+    Args:
+        schemas: resolve_dependencies で並べ替えたスキーマ定義のリスト
+
+    Returns:
+        テーブル名をキーとする生成計画の辞書
+    """
+    return {schema["table_name"]: compile_schema(schema) for schema in schemas}
+
+
+def _parse_range(spec: Any) -> Tuple[int, int]:
+    """
+    `1~3` 形式の範囲指定を (最小, 最大) に変換する。
+
+    Args:
+        spec: 範囲指定文字列（単一の数値も可）
+
+    Returns:
+        (最小値, 最大値)
+    """
+    parts = str(spec).split("~")
+    low = int(parts[0])
+    high = int(parts[-1]) if len(parts) > 1 else low
+    return low, high
+
+
+def _take(values: Sequence, indices: np.ndarray) -> Sequence:
+    """
+    列からインデックス配列の順に値を取り出す。
+
+    Args:
+        values: 元の列（リストまたは NumPy 配列）
+        indices: 取り出す位置の配列
+
+    Returns:
+        取り出した値の列
+    """
+    if not isinstance(values, np.ndarray):
+        values = _object_array(values)
+    return values[indices]
+
+
+def _positions_within(counts: np.ndarray) -> np.ndarray:
+    """
+    グループごとの件数から、各グループ内での 1 始まりの位置を返す。
+
+    例: counts=[2, 3] -> [1, 2, 1, 2, 3]
+
+    Args:
+        counts: グループごとの件数
+
+    Returns:
+        グループ内の位置の配列
+    """
+    total = int(counts.sum())
+    starts = np.cumsum(counts) - counts
+    return np.arange(total) - np.repeat(starts, counts) + 1
+
+
+def table_length(table: Mapping[str, Sequence]) -> int:
+    """
+    列指向テーブルの行数を返す。
+
+    Args:
+        table: 列名をキーとする列の辞書、または ColumnTable
+
+    Returns:
+        行数（列が1つもない場合は 0）
+    """
+    if isinstance(table, ColumnTable):
+        return table.num_rows
+    for values in table.values():
+        return len(values)
+    return 0
+
+
+def iter_rows(table: Dict[str, Sequence]) -> Iterator[Tuple[Any, ...]]:
+    """
+    列指向テーブルを、列順のタプルとして1行ずつ組み立てる。
+
+    Args:
+        table: 列名をキーとする列の辞書
+
+    Returns:
+        行タプルのイテレータ
+    """
+    return zip(*(_as_list(values) for values in table.values()))
+
+
+def concat_columns(chunks: List[Dict[str, Sequence]]) -> Dict[str, Sequence]:
+    """
+    チャンクごとの列を、列ごとに連結して1つのテーブルにする。
+
+    Args:
+        chunks: 列名をキーとする列の辞書のリスト
+
+    Returns:
+        連結したテーブル（チャンクがなければ空の辞書）
+    """
+    if not chunks:
+        return {}
+    if len(chunks) == 1:
+        return chunks[0]
+    table = {}
+    for name in chunks[0]:
+        parts = [chunk[name] for chunk in chunks]
+        if all(isinstance(part, np.ndarray) for part in parts):
+            table[name] = np.concatenate(parts)
+        else:
+            table[name] = list(chain.from_iterable(_as_list(part) for part in parts))
+    return table
+
+
+class StoredColumn:
+    """
+    テーブルストアに保持する1列分の値。
+
+    values はそのまま保持する型付き配列。categories がある場合は辞書符号化されており、
+    values はカテゴリ番号（符号なし整数）の配列になる。
+    values が bytes 型（dtype の kind が "S"）の場合は ASCII 文字列を詰めて保持している。
+    values がメモリマップしたファイル（MappedColumns で書き出したもの）の場合、pickle するときは
+    ファイル名と位置だけを渡し、受け取ったプロセスで同じファイルをマップし直す（値はコピーしない）。
+
+    Args:
+        values: 値、またはカテゴリ番号の配列
+        categories: 辞書符号化のカテゴリ（object 配列）。符号化しない場合は None
+    """
+
+    __slots__ = ("values", "categories")
+
+    def __init__(self, values: np.ndarray, categories: Optional[np.ndarray] = None):
+        self.values = values
+        self.categories = categories
+
+    def __reduce__(self):
+        location = _mapped_location(self.values)
+        if location is None:
+            return StoredColumn, (self.values, self.categories)
+        return _open_mapped_column, (*location, self.categories)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        列がメモリ上に保持している配列のバイト数。
+
+        object 配列が指す文字列本体と、メモリマップしたファイル上の値は含まない。
+        """
+        values = 0 if _mapped_location(self.values) is not None else self.values.nbytes
+        return values + (self.categories.nbytes if self.categories is not None else 0)
+
+    def _decode(self, values: np.ndarray) -> np.ndarray:
+        if self.categories is not None:
+            return self.categories[values]
+        if values.dtype.kind == "S":
+            return values.astype(str)
+        return values
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """
+        指定した位置の値を、元の値に戻して取り出す。
+
+        Args:
+            indices: 取り出す位置の配列
+
+        Returns:
+            値の配列
+        """
+        return self._decode(self.values[indices])
+
+    def decode(self) -> np.ndarray:
+        """
+        列全体を元の値に戻して返す。
+
+        Returns:
+            値の配列
+        """
+        return self._decode(self.values)
+
+    def slice(self, start: int, stop: int) -> "StoredColumn":
+        """
+        start から stop の手前までを、符号化したまま切り出す（値はコピーしない）。
+
+        Args:
+            start: 先頭の位置
+            stop: 末尾の次の位置
+
+        Returns:
+            切り出した列
+        """
+        return StoredColumn(self.values[start:stop], self.categories)
+
+
+class ChunkedColumn:
+    """
+    チャンクごとに符号化した StoredColumn をつないだ1列分の値。
+
+    TableBuilder がチャンク単位で組み立てる列で、各チャンクはメモリ上にも
+    メモリマップしたファイル上にも置ける。take は位置の属するチャンクごとにまとめて取り出す。
+
+    Args:
+        parts: 行順に並んだチャンクの列
+    """
+
+    __slots__ = ("parts", "offsets")
+
+    def __init__(self, parts: List[StoredColumn]):
+        self.parts = parts
+        self.offsets = np.cumsum([0] + [len(part) for part in parts])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """列がメモリ上に保持している配列のバイト数。"""
+        return sum(part.nbytes for part in self.parts)
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """
+        指定した位置の値を、元の値に戻して取り出す。
+
+        Args:
+            indices: 取り出す位置の配列
+
+        Returns:
+            値の配列
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        which = np.searchsorted(self.offsets, indices, side="right") - 1
+        order = np.argsort(which, kind="stable")
+        sorted_indices, sorted_which = indices[order], which[order]
+        bounds = np.searchsorted(sorted_which, np.arange(len(self.parts) + 1))
+        pieces = [
+            self.parts[i].take(sorted_indices[bounds[i]:bounds[i + 1]] - self.offsets[i])
+            for i in range(len(self.parts)) if bounds[i] < bounds[i + 1]
+        ]
+        if not pieces:
+            return self.parts[0].take(indices) if self.parts else np.empty(0, dtype=object)
+        values = np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+        result = np.empty_like(values)
+        result[order] = values
+        return result
+
+    def decode(self) -> np.ndarray:
+        """
+        列全体を元の値に戻して返す。
+
+        Returns:
+            値の配列
+        """
+        return np.concatenate([part.decode() for part in self.parts]) if self.parts else np.empty(0, dtype=object)
+
+    def slice(self, start: int, stop: int) -> "ChunkedColumn":
+        """
+        start から stop の手前までを、符号化したまま切り出す。
+
+        Args:
+            start: 先頭の位置
+            stop: 末尾の次の位置
+
+        Returns:
+            切り出した列
+        """
+        parts = []
+        for part, offset in zip(self.parts, self.offsets):
+            if offset < stop and start < offset + len(part):
+                parts.append(part.slice(max(start - offset, 0), min(stop - offset, len(part))))
+        return ChunkedColumn(parts)
+
+
+def _mapped_location(values: np.ndarray) -> Optional[Tuple[str, str, int, int]]:
+    """
+    メモリマップした1次元配列（またはその連続した切り出し）の、ファイル上の位置を求める。
+
+    Args:
+        values: 配列
+
+    Returns:
+        (ファイル名, dtype の文字列表現, 要素数, ファイル先頭からのバイト位置)。
+        メモリマップした連続な配列でなければ None
+    """
+    root = values
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if not isinstance(root, np.memmap) or root.filename is None:
+        return None
+    if values.ndim != 1 or not values.flags.c_contiguous:
+        return None
+    offset = root.offset + values.__array_interface__["data"][0] - root.__array_interface__["data"][0]
+    return root.filename, values.dtype.str, len(values), offset
+
+
+def _open_mapped_column(filename: str, dtype: str, length: int, offset: int,
+                        categories: Optional[np.ndarray]) -> "StoredColumn":
+    """pickle で渡されたファイル上の位置から、メモリマップした列を開き直す。"""
+    if not length:
+        return StoredColumn(np.empty(0, dtype=np.dtype(dtype)), categories)
+    values = np.memmap(filename, dtype=np.dtype(dtype), mode="r", offset=offset, shape=(length,))
+    return StoredColumn(values, categories)
+
+
+class MappedColumns:
+    """
+    列の値配列を .npy ファイルに書き出し、メモリマップで開き直して共有するための置き場。
+
+    メモリマップした列はワーカープロセスへ渡すときにファイルの位置だけが送られ、
+    各ワーカーは同じページキャッシュを参照する。そのためメモリ使用量は
+    テーブル数 × ワーカー数ではなく、テーブル数に比例する。
+    object 配列（ASCII 以外の文字列など）はファイルにできないため、そのまま保持する。
+
+    Args:
+        directory: 一時ディレクトリを作る場所（省略時はシステムの一時ディレクトリ）
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(tempfile.mkdtemp(prefix="datagen-", dir=directory))
+        self._count = 0
+
+    def publish(self, column: Union[StoredColumn, "ChunkedColumn"]) -> Union[StoredColumn, "ChunkedColumn"]:
+        """
+        列の値配列をファイルに書き出し、メモリマップした列を返す。
+
+        Args:
+            column: 列
+
+        Returns:
+            メモリマップした列（書き出せない列はそのまま）
+        """
+        if isinstance(column, ChunkedColumn):
+            return ChunkedColumn([self.publish(part) for part in column.parts])
+        if column.values.dtype.kind == "O" or _mapped_location(column.values) is not None:
+            return column
+        path = self.directory / f"{self._count:06d}.npy"
+        self._count += 1
+        np.save(path, column.values)
+        return StoredColumn(np.load(path, mmap_mode="r"), column.categories)
+
+    def publish_table(self, table: "ColumnTable") -> "ColumnTable":
+        """
+        テーブルの全列をファイルに書き出し、メモリマップした列のテーブルを返す。
+
+        Args:
+            table: テーブル
+
+        Returns:
+            メモリマップした列のテーブル
+        """
+        mapped = ColumnTable({})
+        mapped.num_rows = table.num_rows
+        mapped.columns = {name: self.publish(column) for name, column in table.columns.items()}
+        return mapped
+
+    def close(self) -> None:
+        """書き出したファイルを一時ディレクトリごと削除する。"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _smallest_uint(limit: int) -> np.dtype:
+    """0 から limit までを表せる最小の符号なし整数型を返す。"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if limit <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def encode_column(values: Sequence, max_cardinality: float = DICT_ENCODE_RATIO) -> StoredColumn:
+    """
+    列をテーブルストア向けのコンパクトな表現に変換する。
+
+    - 整数の配列は値の範囲に収まる最小の整数型に詰める
+    - 異なる値の数が行数 × max_cardinality 以下の列は辞書符号化する（ref, const など）
+    - それ以外の ASCII 文字列の列は固定長の bytes 配列に詰める
+    - 上記に当てはまらない列は object 配列のまま保持する
+
+    Args:
+        values: 元の列（リストまたは NumPy 配列）
+        max_cardinality: 辞書符号化する、行数に対する異なる値の数の上限比率
+
+    Returns:
+        変換した列
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+        if len(values):
+            low, high = int(values.min()), int(values.max())
+            for dtype in (np.int8, np.int16, np.int32):
+                info = np.iinfo(dtype)
+                if info.min <= low and high <= info.max:
+                    return StoredColumn(values.astype(dtype))
+        return StoredColumn(values)
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fb":
+        return StoredColumn(values)
+
+    values = _as_list(values)
+    limit = max(1, int(len(values) * max_cardinality))
+    mapping = {}
+    codes = []
+    for value in values:
+        code = mapping.get(value)
+        if code is None:
+            if len(mapping) >= limit:
+                break
+            code = mapping[value] = len(mapping)
+        codes.append(code)
+    else:
+        return StoredColumn(np.array(codes, dtype=_smallest_uint(len(mapping))), _object_array(list(mapping)))
+
+    if all(type(value) is str for value in values):
+        try:
+            return StoredColumn(np.array(values, dtype=bytes))
+        except UnicodeEncodeError:
+            pass
+    return StoredColumn(_object_array(values))
+
+
+class ColumnTable(Mapping):
+    """
+    DATA に保持する列指向のテーブル。
+
+    各列は encode_column で型付き配列または辞書符号化した配列として保持し、
+    行ごとの辞書を持たない。列名での参照（table[name]）は元の値に戻した配列を返す。
+    子テーブルの生成やポインタの抽出など、行が必要な箇所では take / iter_rows を使う。
+
+    Args:
+        columns: 列名をキーとする列の辞書
+    """
+
+    def __init__(self, columns: Mapping[str, Sequence]):
+        self.num_rows = table_length(columns)
+        self.columns = {name: encode_column(values) for name, values in columns.items()}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name].decode()
+
+    def __contains__(self, name: object) -> bool:
+        # Mapping の既定の実装は __getitem__ で列全体を元に戻すため、列名だけを調べる
+        return name in self.columns
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """全列が保持している配列のバイト数の合計。"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def take(self, name: str, indices: np.ndarray) -> np.ndarray:
+        """
+        列から指定した位置の値だけを取り出す（列全体は元に戻さない）。
+
+        Args:
+            name: 列名
+            indices: 取り出す位置の配列
+
+        Returns:
+            値の配列
+        """
+        return self.columns[name].take(indices)
+
+    def iter_rows(self, names: Optional[List[str]] = None, block_size: int = CHUNK_SIZE) -> Iterator[Tuple[Any, ...]]:
+        """
+        指定した列だけを、列順のタプルとして1行ずつ返す（行ビュー）。
+
+        列は block_size 行ずつ元に戻すため、ディスク上の列でもメモリに載るのは1ブロック分だけになる。
+
+        Args:
+            names: 対象の列名（省略時はすべての列）
+            block_size: 一度に元に戻す行数
+
+        Returns:
+            行タプルのイテレータ
+        """
+        names = list(self.columns) if names is None else names
+        for start in range(0, self.num_rows, block_size):
+            index = np.arange(start, min(start + block_size, self.num_rows))
+            yield from zip(*(self.take(name, index).tolist() for name in names))
+
+    def slice(self, start: int, stop: int) -> "ColumnTable":
+        """
+        start から stop の手前までの行だけを持つテーブルを返す。列は符号化したまま切り出す。
+
+        Args:
+            start: 先頭の行の位置
+            stop: 末尾の次の行の位置
+
+        Returns:
+            切り出したテーブル
+        """
+        table = ColumnTable({})
+        table.num_rows = max(0, min(stop, self.num_rows) - start)
+        table.columns = {name: column.slice(start, stop) for name, column in self.columns.items()}
+        return table
+
+
+class TableBuilder:
+    """
+    書き出したチャンクのうち後続のテーブルが使う列を、チャンクごとに符号化して溜める。
+
+    DATA・ref プールと組み立て中の列の合計が max_memory を超えたら、溜めた列と以降のチャンクを
+    MappedColumns でディスクに書き出す（アウトオブコア）。書き出した列も ColumnTable として
+    ランダムな位置の取り出し（ref のサンプリング）と先頭からの走査（子テーブル・ポインタ）ができる。
+    _keep_columns には list の代わりに渡せる。
+
+    Args:
+        max_memory: メモリ上に保持するデータ量の上限（バイト）
+        spill: 書き出し先
+    """
+
+    def __init__(self, max_memory: int, spill: "MappedColumns"):
+        self.max_memory = max_memory
+        self.spill = spill
+        self.parts: Dict[str, List[StoredColumn]] = {}
+        self.num_rows = 0
+        self.spilled = False
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    @property
+    def nbytes(self) -> int:
+        """組み立て中の列がメモリ上に保持している配列のバイト数。"""
+        return sum(part.nbytes for parts in self.parts.values() for part in parts)
+
+    def append(self, chunk: Mapping[str, Sequence]) -> None:
+        """
+        チャンクを列ごとに符号化して追加する。上限を超えたらディスクに書き出す。
+
+        Args:
+            chunk: 列名をキーとする列の辞書
+        """
+        n = table_length(chunk)
+        if not n:
+            return
+        for name, values in chunk.items():
+            self.parts.setdefault(name, []).append(encode_column(values))
+        self.num_rows += n
+        if not self.spilled and retained_bytes() + self.nbytes > self.max_memory:
+            self.spilled = True
+        if self.spilled:
+            self.parts = {name: [self.spill.publish(part) for part in parts] for name, parts in self.parts.items()}
+
+    def build(self) -> ColumnTable:
+        """
+        溜めた列からテーブルを作る。
+
+        Returns:
+            テーブル
+        """
+        table = ColumnTable({})
+        table.num_rows = self.num_rows
+        table.columns = {
+            name: parts[0] if len(parts) == 1 else ChunkedColumn(parts)
+            for name, parts in self.parts.items()
+        }
+        return table
+
+
+def _child_chunk(plan: List[FieldPlan], parents: ColumnTable, start: int, counts: np.ndarray) -> Dict[str, Sequence]:
+    """
+    親レコード start 以降の len(counts) 件分について、子レコードの列を生成する。
+
+    Args:
+        plan: 子テーブルの生成計画
+        parents: 親テーブル
+        start: 対象とする先頭の親レコードの位置
+        counts: 親レコードごとの子レコード件数
+
+    Returns:
+        列名をキーとする列の辞書
+    """
+    parent_index = start + np.repeat(np.arange(len(counts)), counts)
+    total = len(parent_index)
+    columns = {}
+    for p in plan:
+        if p.parent_field is not None:
+            if p.parent_field in parents:
+                columns[p.name] = parents.take(p.parent_field, parent_index)
+            else:
+                columns[p.name] = [1] * total
+        elif p.ftype == "auto_increment" and not p.constant:
+            # 親レコードごとに AUTO_INC がリセットされるため、親内での位置が連番になる
+            columns[p.name] = _positions_within(counts)
+        else:
+            columns[p.name] = p.generate_column(total)
+    return columns
+
+
+def _immutable_chunk(plan: List[FieldPlan], n: int, versions: np.ndarray) -> Dict[str, Sequence]:
+    """
+    n 件分の基本レコードを生成し、バージョン数だけ展開した列を返す。
+
+    Args:
+        plan: イミュータブルテーブルの生成計画
+        n: 基本レコードの件数
+        versions: 基本レコードごとのバージョン数
+
+    Returns:
+        列名をキーとする列の辞書（version_sequence の列は末尾）
+    """
+    base_index = np.repeat(np.arange(n), versions)
+    columns = {}
+    for p in plan:
+        if p.ftype != "version_sequence":
+            columns[p.name] = _take(p.generate_column(n), base_index)
+    for p in plan:
+        if p.ftype == "version_sequence":
+            columns[p.name] = p.generate_column(len(base_index)) if p.constant else _positions_within(versions)
+    return columns
+
+
+class Shard(NamedTuple):
+    """
+    テーブルを分割して生成する単位（シャード）。
+
+    乱数ストリーム（RandomStreams）と連番は、シャードより前の行数から求めた位置から始めるため、
+    各行の値はシャードの区切り方やどのプロセスで生成したかによらず同じになる。
+
+    Attributes:
+        table_name: テーブル名
+        index: シャード番号
+        start: 先頭の基本レコード（子テーブルの場合は親レコード）の位置
+        stop: 末尾の次の位置
+        rows_before: このシャードより前の行数（子テーブルでは子レコードの件数）
+        seed: 乱数のシード
+        parent_offset: 子テーブルで、DATA の親テーブルの先頭行が親レコードの何件目にあたるか
+            （ワーカーには親テーブルをシャードの範囲だけ切り出して渡すため）
+    """
+    table_name: str
+    index: int
+    start: int
+    stop: int
+    rows_before: int
+    seed: int
+    parent_offset: int = 0
+
+
+def _seq_slots(schema: Dict[str, Any]) -> Dict[str, int]:
+    """
+    code 型のパターンごとに、1行で消費する連番の数を求める。
+
+    Args:
+        schema: テーブル定義
+
+    Returns:
+        パターンをキー、1行あたりの連番スロット数を値とする辞書
+    """
+    slots = defaultdict(int)
+    for field_def in schema.get("fields", {}).values():
+        if isinstance(field_def, dict) and field_def.get("type") == "code" and "default" not in field_def:
+            pattern = field_def.get("pattern", "CODE-{seq:6}")
+            slots[pattern] += CodeTemplate(pattern).seq_slots
+    return slots
+
+
+def shared_sequences(schemas: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    {seq} を含む同じパターンを使うテーブルを、パターンごとに集める。
+
+    連番はテーブルごとに 1 から始まるため、これらのテーブルでは同じ値が出力される。
+
+    Args:
+        schemas: スキーマ定義のリスト
+
+    Returns:
+        2つ以上のテーブルで使われているパターンをキー、テーブル名のリストを値とする辞書
+    """
+    tables = defaultdict(list)
+    for schema in schemas:
+        for pattern, slots in _seq_slots(schema).items():
+            if slots:
+                tables[pattern].append(schema["table_name"])
+    return {pattern: names for pattern, names in tables.items() if len(names) > 1}
+
+
+def _seq_layout(schema: Dict[str, Any]) -> Dict[str, Tuple[int, int]]:
+    """
+    code 型のフィールドごとに、行内で使う連番スロットの位置を決める。
+
+    同じパターンのフィールドは、フィールド順に行内の連番スロットを分け合う（1行ずつ生成したときと同じ並び）。
+
+    Args:
+        schema: テーブル定義
+
+    Returns:
+        フィールド名をキー、(行内の連番スロットの位置, そのパターンの1行あたりの連番スロット数) を値とする辞書
+    """
+    row_slots = _seq_slots(schema)
+    used = defaultdict(int)
+    layout = {}
+    for name, field_def in schema.get("fields", {}).items():
+        if isinstance(field_def, dict) and field_def.get("type") == "code" and "default" not in field_def:
+            pattern = field_def.get("pattern", "CODE-{seq:6}")
+            layout[name] = (used[pattern], row_slots[pattern])
+            used[pattern] += CodeTemplate(pattern).seq_slots
+    return layout
+
+
+def _is_child(schema: Dict[str, Any]) -> bool:
+    """親テーブルの各レコードに対して子レコードを生成するテーブルなら True。"""
+    return schema["type"] in ("immutable", "transactional") and "parent" in schema
+
+
+def _child_counts(schema: Dict[str, Any], shard: Shard) -> np.ndarray:
+    """
+    シャード内の親レコードごとの子レコード件数を引く。シャード分割時と生成時で同じ値になる。
+
+    Args:
+        schema: 子テーブルの定義
+        shard: シャード
+
+    Returns:
+        親レコードごとの子レコード件数
+    """
+    minc, maxc = _parse_range(schema.get("count_per_parent", "1"))
+    rng = RandomStreams.for_table(shard.seed, shard.table_name, shard.start)[COUNT_STREAM]
+    return rng.integers(minc, maxc, size=shard.stop - shard.start, endpoint=True)
+
+
+def shard_rows(schema: Dict[str, Any], shard: Shard) -> Optional[int]:
+    """
+    シャードが出力する行数を、行を生成せずに求める。
+
+    子テーブルの件数と immutable のバージョン数はカウンタ方式の乱数から直接引く。
+
+    Args:
+        schema: テーブル定義
+        shard: シャード
+
+    Returns:
+        行数（ポインタテーブルのように抽出元を見ないと決まらない場合は None）
+    """
+    if "records" in schema:
+        return len(schema["records"])
+    if schema["type"] == "pointer":
+        return None
+    if _is_child(schema):
+        return int(_child_counts(schema, shard).sum())
+    if schema["type"] == "immutable":
+        minv, maxv = _parse_range(schema.get("version_range", "1"))
+        stream = RandomStreams.for_table(shard.seed, shard.table_name, shard.start)[VERSION_STREAM]
+        return int(stream.integers(minv, maxv, size=shard.stop - shard.start, endpoint=True).sum())
+    return shard.stop - shard.start
+
+
+def plan_shards(schema: Dict[str, Any], seed: int, shard_size: int = SHARD_SIZE,
+                parent_rows: Optional[int] = None) -> List[Shard]:
+    """
+    テーブルを shard_size 件ずつのシャードに分割する。
+
+    子テーブルは親レコードの範囲で分割し、各シャードの子レコード件数を先に引いて
+    連番の開始位置を決める。ポインタと固定レコードのテーブルは1シャードにまとめる。
+
+    Args:
+        schema: テーブル定義
+        seed: 乱数のシード
+        shard_size: 1シャードあたりの目安の行数
+        parent_rows: 子テーブルの親テーブルの行数（省略時は DATA の親テーブルから求める）
+
+    Returns:
+        シャードのリスト
+    """
+    table_name = schema["table_name"]
+    if "records" in schema or schema["type"] == "pointer":
+        return [Shard(table_name, 0, 0, 0, 0, seed)]
+
+    if _is_child(schema):
+        total = table_length(DATA[schema["parent"]]) if parent_rows is None else parent_rows
+        _, maxc = _parse_range(schema.get("count_per_parent", "1"))
+        step = max(1, shard_size // max(maxc, 1))
+    else:
+        total = schema["count"]
+        step = shard_size
+
+    shards = []
+    rows_before = 0
+    for index, start in enumerate(range(0, total, step)):
+        shard = Shard(table_name, index, start, min(start + step, total), rows_before, seed)
+        shards.append(shard)
+        rows_before += shard_rows(schema, shard) if _is_child(schema) else shard.stop - shard.start
+    return shards
+
+
+def begin_shard(schema: Dict[str, Any], shard: Shard) -> None:
+    """
+    シャードの生成に使う乱数ストリームとカウンタを設定する。
+
+    Args:
+        schema: テーブル定義
+        shard: シャード
+    """
+    global STREAMS
+    STREAMS = RandomStreams.for_table(shard.seed, shard.table_name, shard.rows_before)
+    SEQ_COUNTER.clear()
+    AUTO_INC.clear()
+    for pattern, slots in _seq_slots(schema).items():
+        SEQ_COUNTER[pattern] = shard.rows_before * slots
+    if not _is_child(schema):
+        for name, field_def in schema.get("fields", {}).items():
+            if isinstance(field_def, dict) and field_def.get("type") == "auto_increment":
+                AUTO_INC[name] = shard.rows_before
+
+
+def iter_chunks(schema: Dict[str, Any], plan: Optional[List[FieldPlan]] = None,
+                chunk_size: int = CHUNK_SIZE, shard: Optional[Shard] = None) -> Iterator[Dict[str, Sequence]]:
+    """
+    単一スキーマに基づいて、列単位のデータをチャンクに分けて順に生成する。
+
+    1チャンクはおよそ chunk_size 行に収まるように区切るため、
+    件数によらず一度にメモリに載るのは1チャンク分だけになる。
+    shard を指定した場合は、そのシャードの範囲だけをシャード専用の乱数列で生成する。
+
+    Args:
+        schema: テーブル定義を含む辞書（type, fields, countなど）
+        plan: compile_schema で作成した生成計画（省略時はここでコンパイルする）
+        chunk_size: 1チャンクあたりの目安の行数
+        shard: 生成するシャード（省略時はテーブル全体を現在の乱数生成器で生成する）
+
+    Returns:
+        列名をキーとする列（リストまたは NumPy 配列）の辞書のイテレータ
+    """
+    if "records" in schema:
+        records = schema["records"]
+        if records:
+            yield {k: [r[k] for r in records] for k in records[0]}
+        return
+
+    table_type = schema["type"]
+    if plan is None:
+        plan = compile_schema(schema)
+    if shard is not None:
+        begin_shard(schema, shard)
+
+    if table_type == "master" or (table_type == "transactional" and "parent" not in schema):
+        first, last = (shard.start, shard.stop) if shard is not None else (0, schema["count"])
+        for start in range(first, last, chunk_size):
+            n = min(chunk_size, last - start)
+            yield {p.name: p.generate_column(n) for p in plan}
+
+    elif _is_child(schema):
+        parents = DATA[schema["parent"]]
+        if not isinstance(parents, ColumnTable):
+            parents = ColumnTable(parents)
+        minc, maxc = _parse_range(schema.get("count_per_parent", "1"))
+        if shard is not None:
+            first, last, base = shard.start, shard.stop, shard.parent_offset
+            counts = _child_counts(schema, shard)
+        else:
+            first, last, base = 0, table_length(parents), 0
+            counts = STREAMS[COUNT_STREAM].integers(minc, maxc, size=last, endpoint=True)
+            AUTO_INC.clear()
+        step = max(1, chunk_size // max(maxc, 1))
+        for start in range(first, last, step):
+            offset = start - first
+            yield _child_chunk(plan, parents, start - base, counts[offset:offset + step])
+
+    elif table_type == "immutable":
+        first, last = (shard.start, shard.stop) if shard is not None else (0, schema["count"])
+        minv, maxv = _parse_range(schema.get("version_range", "1"))
+        step = max(1, chunk_size // max(maxv, 1))
+        for start in range(first, last, step):
+            n = min(step, last - start)
+            yield _immutable_chunk(plan, n, STREAMS[VERSION_STREAM].integers(minv, maxv, size=n, endpoint=True))
+
+    elif table_type == "pointer":
+        source = DATA[schema["source_table"]]
+        if not table_length(source):
+            return
+        key_fields = schema["key"]
+        latest_field = schema["latest_field"]
+
+        latest = {}
+        for i, (value, *key) in enumerate(source.iter_rows([latest_field, *key_fields])):
+            best = latest.get(tuple(key))
+            if best is None or value > best[0]:
+                latest[tuple(key)] = (value, i)
+        index = np.fromiter((i for _, i in latest.values()), dtype=np.int64, count=len(latest))
+        for start in range(0, len(index), chunk_size):
+            chunk_index = index[start:start + chunk_size]
+            yield {name: source.take(name, chunk_index) for name in source}
+
+
+def generate_columns(schema: Dict[str, Any], plan: Optional[List[FieldPlan]] = None) -> Dict[str, Sequence]:
+    """
+    単一スキーマに基づいて、列単位でまとめてデータを生成する。
+
+    各フィールドは1列分を一度に生成し、行の組み立ては出力時まで行わない。
+
+    Args:
+        schema: テーブル定義を含む辞書（type, fields, countなど）
+        plan: compile_schema で作成した生成計画（省略時はここでコンパイルする）
+
+    Returns:
+        列名をキーとする列（リストまたは NumPy 配列）の辞書
+    """
+    return concat_columns(list(iter_chunks(schema, plan)))
+
+
+def generate_rows(schema: Dict[str, Any], plan: Optional[List[FieldPlan]] = None, stream: bool = False,
+                  rows: Optional[range] = None, seed: Optional[int] = None,
+                  schemas: Optional[List[Dict[str, Any]]] = None) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """
+    単一スキーマに基づいて、複数行のデータレコードを生成する。
+
+    rows を指定すると、その範囲の行だけを、それより前の行を生成せずに作る（master / transactional / immutable のみ）。
+    各行の値はシード・テーブル名・行の位置・列名だけで決まるため、同じ seed で
+    テーブル全体を生成した場合の同じ位置の行と一致する。rows を指定せず seed だけを指定した場合は、
+    どの種類のテーブルでも、同じ seed で一度に生成した場合と同じテーブル全体を作る。
+
+    ref フィールドが参照するテーブルは、先に DATA / REF_POOLS に生成しておく必要がある。
+    schemas にスキーマ定義のリストを渡すと、まだ生成していない依存テーブルを
+    prepare_dependencies で同じ seed から生成してから行を作る。
+
+    Args:
+        schema: テーブル定義を含む辞書（type, fields, countなど）
+        plan: compile_schema で作成した生成計画（省略時はここでコンパイルする）
+        stream: True の場合、チャンク単位で生成しながら1行ずつ返すジェネレータを返す
+        rows: 生成する行の範囲（master / transactional のみ。immutable では基本レコードの範囲）
+        seed: 乱数のシード（省略時は実行ごとに異なる値になる）
+        schemas: 依存テーブルを含むスキーマ定義のリスト（省略時は依存テーブルを生成しない）
+
+    Returns:
+        生成されたレコードのリスト（辞書のリスト）。stream=True の場合はそのイテレータ
+    """
+    shards: List[Optional[Shard]] = [None]
+    if rows is not None:
+        shards = [row_range_shard(schema, rows, seed)]
+        seed = shards[0].seed
+    elif seed is None and schemas is not None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    if schemas is not None:
+        prepare_dependencies(schemas, schema["table_name"], seed)
+    if rows is None and seed is not None:
+        # 行範囲の指定がなければ、テーブル全体を一度に生成する場合と同じシャードで作る（子テーブル・ポインタも含む）
+        shards = plan_shards(schema, seed)
+    if plan is None:
+        plan = compile_schema(schema)
+    records = (
+        dict(zip(chunk, row))
+        for shard in shards
+        for chunk in iter_chunks(schema, plan, shard=shard)
+        for row in iter_rows(chunk)
+    )
+    return records if stream else list(records)
+
+
+def row_range_shard(schema: Dict[str, Any], rows: range, seed: Optional[int] = None) -> Shard:
+    """
+    master / transactional / immutable テーブルの行範囲を、1つのシャードとして表す。
+
+    Args:
+        schema: テーブル定義
+        rows: 行の範囲（immutable では基本レコードの範囲。step は 1 のみ）
+        seed: 乱数のシード（省略時は OS のエントロピーから決める）
+
+    Returns:
+        シャード
+    """
+    if "records" in schema or schema["type"] == "pointer" or _is_child(schema):
+        raise ValueError(f"[ERROR] 行範囲の指定は master / transactional / immutable テーブルのみ対応しています: {schema['table_name']}")
+    if rows.step != 1:
+        raise ValueError("[ERROR] 行範囲の step は 1 のみ指定できます")
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    start, stop = min(rows.start, schema["count"]), min(rows.stop, schema["count"])
+    return Shard(schema["table_name"], 0, start, max(start, stop), start, seed)
+
+
+def dependency_graph(schemas: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
+    """
+    テーブルごとに、生成前に必要な（依存する）テーブルの集合を求める。
+
+    Args:
+        schemas: スキーマ定義のリスト
+
+    Returns:
+        テーブル名をキー、依存先テーブル名の集合を値とする辞書
+    """
+    graph = defaultdict(set)
+
+    for schema in schemas:
+        name = schema["table_name"]
+
+        # 全てのref依存を検出
+        for field_def in schema.get("fields", {}).values():
+            if isinstance(field_def, dict) and field_def.get("type") == "ref":
+                ref_table = field_def["table"]
+                graph[name].add(ref_table)
+
+        if "parent" in schema:
+            graph[name].add(schema["parent"])
+
+        if schema["type"] == "pointer":
+            graph[name].add(schema["source_table"])
+
+    return graph
+
+
+def resolve_dependencies(schemas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    スキーマ間の依存関係を解析し、正しい順序に並べ替える。
+
+    Args:
+        schemas: スキーマ定義のリスト
+
+    Returns:
+        依存関係順にソートされたスキーマ定義のリスト
+    """
+    graph = dependency_graph(schemas)
+    name_to_schema = {schema["table_name"]: schema for schema in schemas}
+
+    visited = set()
+    sorted_schemas = []
+
+    def visit(n):
+        if n in visited:
+            return
+        for dep in graph.get(n, []):
+            visit(dep)
+        visited.add(n)
+        sorted_schemas.append(name_to_schema[n])
+
+    for name in name_to_schema:
+        visit(name)
+
+    return sorted_schemas
+
+
+def release_schedule(ordered: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    生成順に対する生存区間を解析し、各テーブルを解放できる時点を求める。
+
+    テーブルは、それに依存する最後のテーブルの生成が終わった時点で不要になる。
+    どこからも依存されないテーブルは、自身の生成が終わった時点で解放できる。
+
+    Args:
+        ordered: resolve_dependencies で並べ替えたスキーマ定義のリスト
+
+    Returns:
+        テーブル名をキー、その生成直後に解放できるテーブル名のリストを値とする辞書
+    """
+    graph = dependency_graph(ordered)
+    last_use = {}
+    for schema in ordered:
+        name = schema["table_name"]
+        last_use[name] = name
+        for dep in graph.get(name, ()):
+            last_use[dep] = name
+
+    schedule = defaultdict(list)
+    for table, user in last_use.items():
+        schedule[user].append(table)
+    return dict(schedule)
+
+
+def release_table(table_name: str) -> None:
+    """
+    テーブルと、そのテーブルの ref プールをメモリから解放する。
+
+    Args:
+        table_name: テーブル名
+    """
+    DATA.pop(table_name, None)
+    for key in [key for key in REF_POOLS if key[0] == table_name]:
+        del REF_POOLS[key]
+
+
+def retained_bytes() -> int:
+    """
+    DATA と ref プールが保持している配列のバイト数の合計を返す（共有している列は1回だけ数える）。
+
+    Returns:
+        バイト数
+    """
+    columns = {id(column): column for table in DATA.values() for column in table.columns.values()}
+    columns.update((id(pool), pool) for pool in REF_POOLS.values())
+    return sum(column.nbytes for column in columns.values())
+
+
+def retained_tables() -> List[str]:
+    """
+    DATA または ref プールとしてメモリに残っているテーブル名を返す。
+
+    Returns:
+        テーブル名のリスト（名前順）
+    """
+    return sorted(set(DATA) | {table for table, _ in REF_POOLS})
+
+
+def memory_usage() -> Tuple[Optional[int], Optional[int]]:
+    """
+    プロセスの現在の常駐メモリ量と、これまでの最大値を返す。
+
+    Returns:
+        (現在の RSS, ピーク RSS) のバイト数。取得できない環境では None
+    """
+    current = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux は KiB 単位、macOS はバイト単位
+        peak = peak if sys.platform == "darwin" else peak * 1024
+        peak = max(peak, current or 0)
+    return current, peak
+
+
+BYTE_UNITS = {"": 1, "K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+
+
+def parse_bytes(text: str) -> int:
+    """
+    `512M`, `4G` などのデータ量の指定をバイト数に変換する。
+
+    Args:
+        text: 数値と単位（K, M, G, T。省略時はバイト。末尾の B / iB は無視する）
+
+    Returns:
+        バイト数
+    """
+    m = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([KMGT]?)(?:I?B)?\s*", text.upper())
+    if m is None:
+        raise ValueError(f"[ERROR] データ量の指定を解釈できません: {text}")
+    return int(float(m.group(1)) * BYTE_UNITS[m.group(2)])
+
+
+def _format_bytes(size: Optional[int]) -> str:
+    """バイト数を MiB 単位の文字列にする。"""
+    return "-" if size is None else f"{size / 2 ** 20:,.1f} MiB"
+
+
+def collect_row_consumers(schemas: List[Dict[str, Any]]) -> Set[str]:
+    """
+    行単位で全件を参照されるテーブル（子テーブルの親、ポインタの抽出元）を集める。
+
+    これらのテーブルは後続のテーブルの生成が終わるまで DATA に全件を保持する必要がある。
+
+    Args:
+        schemas: スキーマ定義のリスト
+
+    Returns:
+        テーブル名の集合
+    """
+    tables = set()
+    for schema in schemas:
+        if "parent" in schema:
+            tables.add(schema["parent"])
+        if schema["type"] == "pointer":
+            tables.add(schema["source_table"])
+    return tables
+
+
+def collect_required_columns(schemas: List[Dict[str, Any]]) -> Dict[str, Optional[Set[str]]]:
+    """
+    後続のテーブルの生成に必要な列を、参照されるテーブルごとに集める。
+
+    - ref: 参照先のフィールド
+    - parent: 子テーブルが親からコピーするフィールド（親への ref、version_sequence の version）と parent_key
+    - pointer: 抽出元の行全体を出力するため、すべての列（None で表す）
+
+    Args:
+        schemas: スキーマ定義のリスト
+
+    Returns:
+        テーブル名をキー、必要な列名の集合（すべての列が必要な場合は None）を値とする辞書
+    """
+    required: Dict[str, Optional[Set[str]]] = {}
+
+    def need(table: str, fields: Optional[Iterable[str]]) -> None:
+        if fields is None or required.get(table, set()) is None:
+            required[table] = None
+        else:
+            required.setdefault(table, set()).update(fields)
+
+    for schema in schemas:
+        parent_table = schema.get("parent")
+        for field_def in schema.get("fields", {}).values():
+            if not isinstance(field_def, dict):
+                continue
+            if field_def.get("type") == "ref":
+                need(field_def["table"], [field_def["field"]])
+            elif field_def.get("type") == "version_sequence" and parent_table is not None:
+                need(parent_table, ["version"])
+        if parent_table is not None:
+            parent_key = schema.get("parent_key", [])
+            need(parent_table, [parent_key] if isinstance(parent_key, str) else parent_key)
+        if schema["type"] == "pointer":
+            need(schema["source_table"], None)
+    return required
+
+
+class ColumnType(NamedTuple):
+    """
+    出力形式が使う1列分の型。
+
+    Attributes:
+        kind: 値の型（int / date / timestamp / uuid / string）
+        dictionary: 値の種類が少なく、辞書符号化して出力する場合は True（ref / const / default）
+        nullable: None を含みうる場合は True
+    """
+    kind: str
+    dictionary: bool = False
+    nullable: bool = False
+
+
+FIELD_KINDS = {
+    "int": "int",
+    "auto_increment": "int",
+    "version_sequence": "int",
+    "date": "date",
+    "timestamp": "timestamp",
+    "uuid": "uuid",
+    "code": "string",
+}
+
+
+def _value_kind(value: Any) -> str:
+    """records / const / default に書かれた値から列の型を決める。"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return "int"
+    if isinstance(value, datetime):
+        return "timestamp"
+    if isinstance(value, date):
+        return "date"
+    return "string"
+
+
+def resolve_column_types(ordered: List[Dict[str, Any]]) -> Dict[str, Dict[str, ColumnType]]:
+    """
+    テーブルごとに、出力する各列の型を、iter_chunks が列を返す順に決める。
+
+    - ref: 参照先フィールドの型（親テーブルへの ref 以外は辞書符号化する）
+    - const / default: 値の型で辞書符号化する
+    - records: 書かれた値の型
+    - pointer: 抽出元テーブルの列の型
+
+    Args:
+        ordered: resolve_dependencies で並べ替えたスキーマ定義のリスト
+
+    Returns:
+        テーブル名をキー、列名をキーとする列の型の辞書（列の出力順）を値とする辞書
+    """
+    types: Dict[str, Dict[str, ColumnType]] = {}
+    for schema in ordered:
+        columns = {}
+        if "records" in schema:
+            records = schema["records"]
+            for name in (records[0] if records else ()):
+                values = [record[name] for record in records if record.get(name) is not None]
+                kind = _value_kind(values[0]) if values else "string"
+                columns[name] = ColumnType(kind, nullable=len(values) < len(records))
+        elif schema["type"] == "pointer":
+            columns = dict(types.get(schema["source_table"], {}))
+        else:
+            for name, field_def in schema["fields"].items():
+                ftype = field_def.get("type")
+                nullable = bool(field_def.get("nullable", False))
+                if "default" in field_def:
+                    value = field_def["default"]
+                    columns[name] = ColumnType(_value_kind(value), True, nullable or value is None)
+                elif ftype == "ref":
+                    ref = types.get(field_def["table"], {}).get(field_def["field"], ColumnType("string"))
+                    dictionary = ref.dictionary if field_def["table"] == schema.get("parent") else True
+                    columns[name] = ColumnType(ref.kind, dictionary, nullable or ref.nullable)
+                elif ftype == "const":
+                    value = field_def.get("value")
+                    columns[name] = ColumnType(_value_kind(value), True, nullable or value is None)
+                elif ftype in FIELD_KINDS:
+                    columns[name] = ColumnType(FIELD_KINDS[ftype], nullable=nullable)
+                else:
+                    columns[name] = ColumnType("string", True, True)
+            if schema["type"] == "immutable" and not _is_child(schema):
+                # バージョン展開した列は末尾に並ぶ（_immutable_chunk と同じ順）
+                versions = [name for name, field_def in schema["fields"].items() if field_def.get("type") == "version_sequence"]
+                columns = {**{k: v for k, v in columns.items() if k not in versions}, **{k: columns[k] for k in versions}}
+        types[schema["table_name"]] = columns
+    return types
+
+
+WRITE_QUEUE_DEPTH = 4
+
+
+class StageTimes:
+    """
+    1テーブル（またはシャード）を書き出すときの、段階ごとの所要時間（秒）。
+
+    generate / encode は生成側のスレッド、write は書き出しスレッド、compress は圧縮スレッドでの時間の合計で、
+    wait は書き出しキューが一杯で生成側が待った時間。wall は書き出し全体の経過時間。
+    書き出し・圧縮を別スレッドで重ねた分だけ、wall は各段階の合計より短くなる。
+    """
+
+    __slots__ = ("generate", "encode", "write", "compress", "wait", "wall")
+
+    def __init__(self):
+        self.generate = self.encode = self.write = self.compress = self.wait = self.wall = 0.0
+
+    def add(self, other: "StageTimes") -> None:
+        """別の所要時間を加算する（シャードごとの時間をテーブル単位にまとめる）。"""
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def timed(self, chunks: Iterable[Dict[str, Sequence]]) -> Iterator[Dict[str, Sequence]]:
+        """チャンクのイテレータを包み、次のチャンクを待った時間を generate に加算する。"""
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            chunk = next(iterator, None)
+            self.generate += time.perf_counter() - start
+            if chunk is None:
+                return
+            yield chunk
+
+    def summary(self) -> str:
+        """段階ごとの時間と、重ねて短縮できた時間を1行にまとめる。"""
+        saved = self.generate + self.encode + self.write + self.compress - self.wall
+        compress = f", compress {self.compress:.2f}s" if self.compress else ""
+        return (
+            f"generate {self.generate:.2f}s, encode {self.encode:.2f}s, write {self.write:.2f}s{compress}, "
+            f"queue wait {self.wait:.2f}s, wall {self.wall:.2f}s (overlap saved {max(saved, 0.0):.2f}s)"
+        )
+
+
+class BackgroundWriter:
+    """
+    書き出しを専用のスレッドで行い、生成・変換と書き出しを重ねる。
+
+    write() は件数に上限のあるキューに入れるだけで戻り、キューが一杯のときだけ空くまで待つ（背圧）。
+    そのため、メモリに溜まるのは depth 件分までになる。書き出しスレッドで起きた例外は、
+    次の write() か close() で呼び出し側に送出する。
+
+    Args:
+        sink: 1件を書き出す関数（書き出しスレッドで、write() した順に呼ぶ）
+        depth: キューに溜める上限の件数。0 の場合はスレッドを使わず、その場で sink を呼ぶ
+        timings: 所要時間を加算する先
+    """
+
+    def __init__(self, sink: Callable[[Any], Any], depth: int = WRITE_QUEUE_DEPTH,
+                 timings: Optional[StageTimes] = None):
+        self.sink = sink
+        self.timings = timings or StageTimes()
+        self.error = None
+        self.queue = None
+        if depth > 0:
+            self.queue = queue.Queue(maxsize=depth)
+            self.thread = threading.Thread(target=self._drain, name="datagen-writer", daemon=True)
+            self.thread.start()
+
+    def _drain(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue  # 失敗した後は、生成側が詰まらないよう読み捨てる
+            start = time.perf_counter()
+            try:
+                self.sink(item)
+            except BaseException as e:
+                self.error = e
+            self.timings.write += time.perf_counter() - start
+
+    def write(self, item: Any) -> None:
+        """1件を書き出しキューに入れる。"""
+        if self.queue is None:
+            start = time.perf_counter()
+            self.sink(item)
+            self.timings.write += time.perf_counter() - start
+            return
+        if self.error is not None:
+            raise self.error
+        start = time.perf_counter()
+        self.queue.put(item)
+        self.timings.wait += time.perf_counter() - start
+
+    def close(self) -> None:
+        """キューに残った分をすべて書き出すまで待つ。"""
+        if self.queue is None:
+            return
+        start = time.perf_counter()
+        self.queue.put(None)
+        self.thread.join()
+        self.timings.wait += time.perf_counter() - start
+        if self.error is not None:
+            raise self.error
+
+
+class OutputFormat:
+    """
+    出力形式の基底クラス。テーブルごとのファイルの書き出しと、シャードのパートファイルの連結を受け持つ。
+
+    ワーカープロセスにも RunSettings ごと渡すため、属性には pickle できる値だけを持たせる。
+    ファイルへの書き込みは BackgroundWriter で書き出しスレッドに回し、次のチャンクの生成と重ねる。
+
+    Attributes:
+        suffix: 出力ファイルの拡張子
+        queue_depth: 書き出しキューに溜めるチャンク数の上限（0 の場合は書き出しスレッドを使わない）
+    """
+    suffix = ".csv"
+    queue_depth = WRITE_QUEUE_DEPTH
+
+    def write(self, path: Path, chunks: Iterable[Dict[str, Sequence]], types: Optional[Dict[str, ColumnType]] = None,
+              header: bool = True, timings: Optional[StageTimes] = None,
+              schema: Optional[Dict[str, Any]] = None) -> Tuple[int, List[str]]:
+        """
+        チャンクを順に書き出す。最初の行が出るまでファイルは作らない。
+
+        Args:
+            path: 出力先のファイルパス
+            chunks: 列名をキーとする列の辞書のイテレータ
+            types: 列名をキーとする列の型（resolve_column_types の結果。列はこの順に書き出す）
+            header: パートファイルではなく、単体で読めるファイルとして書く場合は True
+            timings: 段階ごとの所要時間を加算する先
+            schema: テーブル定義（SQL の DDL など、テーブル名・主キーを使う出力形式で使う）
+
+        Returns:
+            (書き出した行数, 列名のリスト)。types がなく1行も書かなかった場合の列名は空
+        """
+        raise NotImplementedError
+
+    def merge(self, path: Path, names: List[str], parts: List[Path], types: Optional[Dict[str, ColumnType]] = None,
+              schema: Optional[Dict[str, Any]] = None) -> None:
+        """
+        header=False で書いたパートファイルをシャード順に連結する。連結したパートは削除する。
+
+        Args:
+            path: 出力先のファイルパス
+            names: 列名のリスト（空の場合は列が分からないため、ファイルを作らない）
+            parts: シャード順に並んだパートファイルのパス（存在しないものは空のシャード）
+            types: 列名をキーとする列の型
+            schema: テーブル定義
+        """
+        raise NotImplementedError
+
+
+def _null_mask(values: Sequence) -> np.ndarray:
+    """列の None の位置を True とする配列を返す（数値型の配列には None がない）。"""
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        return np.zeros(len(values), dtype=bool)
+    return np.equal(_object_array(values), None)
+
+
+CSV_COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESS_BLOCK_SIZE = 1 << 22
+
+
+def compress_block(data: bytes, compression: str, level: Optional[int] = None) -> bytes:
+    """
+    1ブロックを、単独で伸長できる gzip のメンバー、または zstd のフレームに圧縮する。
+
+    Args:
+        data: 圧縮するバイト列
+        compression: 圧縮方式（gzip / zstd）
+        level: 圧縮レベル（省略時は gzip 6、zstd 3）
+
+    Returns:
+        圧縮したバイト列
+    """
+    if compression == "gzip":
+        compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+class BlockCompressedFile:
+    """
+    書き込んだバイト列をブロックに区切り、スレッドで並列に圧縮しながらファイルに書く（pigz と同じ方式）。
+
+    各ブロックは独立した gzip のメンバー / zstd のフレームになる。連結したものもそのまま
+    gzip -d / zstd -d などで伸長できるため、ブロックごとに別のスレッドで圧縮してよい。
+    zlib / zstandard は圧縮中に GIL を解放するため、スレッド数だけ並列に圧縮できる。
+    圧縮待ち・書き出し待ちのブロックは threads * 2 個までに抑える。
+    各スレッドで圧縮にかかった時間の合計は compress_time に入る。
+
+    Args:
+        path: 出力先のファイルパス
+        compression: 圧縮方式（gzip / zstd）
+        level: 圧縮レベル
+        threads: 圧縮に使うスレッド数（省略時は CPU 数）
+        block_size: 1ブロックのバイト数
+    """
+
+    def __init__(self, path: Path, compression: str, level: Optional[int] = None, threads: Optional[int] = None,
+                 block_size: int = COMPRESS_BLOCK_SIZE):
+        self.compression = compression
+        self.level = level
+        self.block_size = block_size
+        threads = threads or os.cpu_count() or 1
+        self.max_pending = threads * 2
+        self.executor = ThreadPoolExecutor(threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.blocks = 0
+        self.compress_time = 0.0
+        self.file = open(path, "wb")
+
+    def write(self, data: bytes) -> None:
+        """バイト列を書き込む。ブロックの大きさに達した分から圧縮に回す。"""
+        self.buffer += data
+        if len(self.buffer) < self.block_size:
+            return
+        view = memoryview(self.buffer)
+        end = len(self.buffer) - len(self.buffer) % self.block_size
+        for start in range(0, end, self.block_size):
+            self._submit(bytes(view[start:start + self.block_size]))
+        view.release()
+        del self.buffer[:end]
+
+    def _compress(self, block: bytes) -> Tuple[bytes, float]:
+        start = time.perf_counter()
+        data = compress_block(block, self.compression, self.level)
+        return data, time.perf_counter() - start
+
+    def _submit(self, block: bytes) -> None:
+        self.blocks += 1
+        self.pending.append(self.executor.submit(self._compress, block))
+        while len(self.pending) > self.max_pending:
+            self._write_next()
+
+    def _write_next(self) -> None:
+        data, elapsed = self.pending.popleft().result()
+        self.compress_time += elapsed
+        self.file.write(data)
+
+    def close(self) -> None:
+        """残りのブロックを圧縮して書き、ファイルを閉じる（空のファイルも伸長できるよう、1ブロックは必ず書く）。"""
+        try:
+            if self.buffer or not self.blocks:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self._write_next()
+        finally:
+            self.executor.shutdown()
+            self.file.close()
+
+
+CSV_QUOTINGS = ("all", "minimal")
+CSV_LINE_ENDINGS = {"crlf": "\r\n", "lf": "\n"}
+CSV_SPECIAL = re.compile(r'[,"\r\n]')
+NULL_MARK = "\x00"
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def column_texts(values: Sequence, null: str = "") -> List[str]:
+    """
+    1列分の値を、エスケープ前の文字列のリストにする。
+
+    整数の列は値の範囲が狭ければ文字列表を作って取り出す。
+
+    Args:
+        values: 生成した列
+        null: None の代わりに入れる文字列
+
+    Returns:
+        文字列のリスト
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+        if not len(values):
+            return []
+        low, high = int(values.min()), int(values.max())
+        if high - low <= len(values) // 2:
+            labels = np.array([str(v) for v in range(low, high + 1)], dtype=object)
+            return labels[values - low].tolist()
+        return list(map(str, values.tolist()))
+
+    texts = _as_list(values)
+    mask = _null_mask(values)
+    if mask.any():
+        for i in np.flatnonzero(mask).tolist():
+            texts[i] = null
+    try:
+        "".join(texts)
+    except TypeError:
+        texts = list(map(str, texts))
+    return texts
+
+
+class StreamOutput(OutputFormat):
+    """
+    チャンクを順にバイト列にして書き出す出力形式の基底クラス。ファイルの開閉・圧縮・書き出しスレッドとパートの連結を受け持つ。
+
+    サブクラスは、ファイル先頭（_header）、チャンクごとの本体（_body）、ファイル末尾（_footer）の
+    バイト列を作る。パートファイルには本体だけを書き、連結するときに先頭と末尾を付ける。
+    compression を指定すると、BlockCompressedFile で圧縮しながら書き出す。
+
+    Args:
+        compression: 圧縮方式（CSV_COMPRESSIONS のいずれか）。None の場合は圧縮しない
+        level: 圧縮レベル
+        threads: 圧縮に使うスレッド数（省略時は CPU 数）
+        queue_depth: 書き出しキューに溜めるチャンク数の上限
+    """
+    extension = ".txt"
+
+    def __init__(self, compression: Optional[str] = None, level: Optional[int] = None, threads: Optional[int] = None,
+                 queue_depth: int = WRITE_QUEUE_DEPTH):
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("[ERROR] zstd での圧縮には zstandard が必要です（pip install zstandard）")
+        self.compression = compression
+        self.level = level
+        self.threads = threads
+        self.queue_depth = queue_depth
+        self.suffix = self.extension + CSV_COMPRESSIONS.get(compression, "")
+
+    def _open(self, path: Path):
+        """書き出し先のファイルを開く（圧縮する場合は BlockCompressedFile）。"""
+        if self.compression is None:
+            return open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+        return BlockCompressedFile(path, self.compression, self.level, self.threads)
+
+    def _header(self, names: List[str], types: Dict[str, ColumnType], schema: Optional[Dict[str, Any]]) -> bytes:
+        """ファイル先頭に書くバイト列を返す。"""
+        return b""
+
+    def _body(self, columns: List[Sequence], names: List[str], types: Dict[str, ColumnType],
+              schema: Optional[Dict[str, Any]]) -> bytes:
+        """1チャンク分の列（names の順）をバイト列にする。"""
+        raise NotImplementedError
+
+    def _footer(self, schema: Optional[Dict[str, Any]]) -> bytes:
+        """ファイル末尾に書くバイト列を返す。"""
+        return b""
+
+    def write(self, path, chunks, types=None, header=True, timings=None, schema=None):
+        timings = StageTimes() if timings is None else timings
+        started = time.perf_counter()
+        rows = 0
+        types = types or {}
+        names = list(types)
+        f = out = None
+
+        def start() -> BackgroundWriter:
+            nonlocal f
+            f = self._open(path)
+            writer = BackgroundWriter(f.write, self.queue_depth, timings)
+            if header:
+                writer.write(self._header(names, types, schema))
+            return writer
+
+        try:
+            try:
+                if header and names:
+                    out = start()
+                for chunk in timings.timed(chunks):
+                    n = table_length(chunk)
+                    if not n:
+                        continue
+                    names = names or list(chunk.keys())
+                    out = out or start()
+                    encode_start = time.perf_counter()
+                    data = self._body([chunk[name] for name in names], names, types, schema)
+                    timings.encode += time.perf_counter() - encode_start
+                    out.write(data)
+                    rows += n
+                if header and out is not None:
+                    footer = self._footer(schema)
+                    if footer:
+                        out.write(footer)
+            finally:
+                if out is not None:
+                    out.close()
+        finally:
+            if f is not None:
+                f.close()
+                timings.compress += getattr(f, "compress_time", 0.0)
+            timings.wall += time.perf_counter() - started
+        return rows, names
+
+    def merge(self, path, names, parts, types=None, schema=None):
+        if names:
+            with open(path, "wb") as out:
+                # 圧縮したパートは独立したメンバー / フレームの並びなので、圧縮した先頭・末尾とそのまま連結できる
+                def put(data: bytes) -> None:
+                    if data:
+                        out.write(data if self.compression is None else compress_block(data, self.compression, self.level))
+
+                put(self._header(names, types or {}, schema))
+                for part in parts:
+                    if part.exists():
+                        with open(part, "rb") as f:
+                            shutil.copyfileobj(f, out, WRITE_BUFFER_SIZE)
+                put(self._footer(schema))
+                if self.compression is not None and not out.tell():
+                    out.write(compress_block(b"", self.compression, self.level))
+        for part in parts:
+            if part.exists():
+                part.unlink()
+
+
+class CsvOutput(StreamOutput):
+    """
+    CSV 形式の出力。
+
+    チャンクは列ごとに文字列へ変換してから、str.join でまとめて行に組み立て、
+    1チャンク分を1回の書き込みで出力する（csv モジュールの1行ずつの書き込みは使わない）。
+    ヘッダーは列の型（スキーマのフィールド）から作るため、0件のテーブルでもヘッダー行だけのファイルになる。
+    compression を指定すると、BlockCompressedFile で圧縮しながら `.csv.gz` / `.csv.zst` に書き出す。
+
+    Args:
+        quoting: "all" はすべての値を、"minimal" は区切り文字・改行・ダブルクォートを含む値だけをダブルクォートで囲む
+        null: None を書き出す文字列（クォートしない）。None の場合は空文字列として他の値と同じように扱う
+        line_terminator: 行の区切り（"\\r\\n" / "\\n"）
+        compression: 圧縮方式（CSV_COMPRESSIONS のいずれか）。None の場合は圧縮しない
+        level: 圧縮レベル
+        threads: 圧縮に使うスレッド数（省略時は CPU 数）
+        queue_depth: 書き出しキューに溜めるチャンク数の上限
+    """
+    extension = ".csv"
+
+    def __init__(self, quoting: str = "all", null: Optional[str] = None, line_terminator: str = "\r\n",
+                 compression: Optional[str] = None, level: Optional[int] = None, threads: Optional[int] = None,
+                 queue_depth: int = WRITE_QUEUE_DEPTH):
+        super().__init__(compression, level, threads, queue_depth)
+        self.quoting = quoting
+        self.null = null
+        self.line_terminator = line_terminator
+
+    def _texts(self, values: Sequence) -> List[str]:
+        """
+        1列分の値を、クォート前の文字列のリストにする。
+
+        None は null の文字列にする（quoting="all" で null を指定した場合は、クォートを外すための目印にする）。
+
+        Args:
+            values: 生成した列
+
+        Returns:
+            文字列のリスト
+        """
+        return column_texts(values, "" if self.null is None else NULL_MARK if self.quoting == "all" else self.null)
+
+    def _quoted(self, texts: List[str], single: bool) -> List[str]:
+        """
+        quoting="minimal" のとき、クォートが必要な値だけを囲む。
+
+        Args:
+            texts: 1列分の文字列
+            single: 1列だけのテーブルなら True（空文字列を空行と区別するためクォートする）
+
+        Returns:
+            文字列のリスト
+        """
+        joined = NULL_MARK.join(texts)
+        if not any(c in joined for c in ',"\r\n') and not (single and "" in texts):
+            return texts
+        search = CSV_SPECIAL.search
+        return ['"' + t.replace('"', '""') + '"' if search(t) or (single and not t) else t for t in texts]
+
+    def encode(self, columns: List[Sequence]) -> str:
+        """
+        列のリストを CSV の行にする。
+
+        Args:
+            columns: 出力する順に並べた列のリスト
+
+        Returns:
+            行の区切りで終わる CSV の文字列
+        """
+        lines = self.line_terminator
+        if self.quoting == "all":
+            texts = []
+            for column in columns:
+                column = self._texts(column)
+                if '"' in "".join(column):
+                    column = [t.replace('"', '""') for t in column]
+                texts.append(column)
+            text = '"' + f'"{lines}"'.join(map('","'.join, zip(*texts))) + '"' + lines
+            if self.null is not None and NULL_MARK in text:
+                text = text.replace(f'"{NULL_MARK}"', self.null)
+            return text
+        single = len(columns) == 1
+        texts = [self._quoted(self._texts(column), single) for column in columns]
+        return lines.join(map(",".join, zip(*texts))) + lines
+
+    def _header(self, names, types, schema):
+        return self.encode([[name] for name in names]).encode("utf-8")
+
+    def _body(self, columns, names, types, schema):
+        return self.encode(columns).encode("utf-8")
+
+
+HEX_VALUES = np.zeros(256, dtype=np.uint8)
+HEX_VALUES[HEX_DIGITS] = np.arange(16)
+HEX_VALUES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+PARQUET_COMPRESSIONS = ("snappy", "zstd", "gzip", "lz4", "brotli", "none")
+
+
+def uuid_bytes(values: Sequence, mask: np.ndarray) -> np.ndarray:
+    """
+    UUID 文字列の列を、1行 16 バイトの配列にする。16 進数の変換は列ごとにまとめて行う。
+
+    Args:
+        values: `xxxxxxxx-xxxx-...` 形式の文字列の列
+        mask: None の位置が True の配列（その行はすべて 0 になる）
+
+    Returns:
+        (行数, 16) の uint8 配列
+    """
+    text = _object_array(values)
+    text[mask] = "00000000-0000-0000-0000-000000000000"
+    digits = HEX_VALUES[text.astype("S36").view(np.uint8).reshape(-1, 36)[:, UUID_HEX_POSITIONS]]
+    return (digits[:, 0::2] << 4) | digits[:, 1::2]
+
+
+def _uuid_array(values: Sequence, mask: np.ndarray) -> "pa.Array":
+    """
+    UUID 文字列の列を、16 バイトの UUID 型の Arrow 配列にする。
+
+    Args:
+        values: `xxxxxxxx-xxxx-...` 形式の文字列の列
+        mask: None の位置が True の配列
+
+    Returns:
+        UUID 型（pyarrow が対応していない場合は 16 バイトの固定長バイナリ型）の配列
+    """
+    raw = uuid_bytes(values, mask)
+    validity = pa.array(~mask).buffers()[1] if mask.any() else None
+    storage = pa.FixedSizeBinaryArray.from_buffers(pa.binary(16), len(raw), [validity, pa.py_buffer(raw.tobytes())],
+                                                   null_count=int(mask.sum()))
+    if hasattr(pa, "uuid"):
+        return pa.ExtensionArray.from_storage(pa.uuid(), storage)
+    return storage
+
+
+def arrow_column(values: Sequence, ctype: Optional[ColumnType]) -> "pa.Array":
+    """
+    生成した列を、列の型に合わせた Arrow 配列にする。
+
+    date / timestamp の文字列は NumPy の日時型でまとめて解釈する。
+    型が分からない列は pyarrow の型推論に任せる。
+
+    Args:
+        values: 生成した列
+        ctype: 列の型
+
+    Returns:
+        Arrow 配列（ctype.dictionary の場合は辞書型）
+    """
+    if ctype is None:
+        return pa.array(_as_list(values))
+    if ctype.kind == "int":
+        array = pa.array(values, type=pa.int64())
+    elif ctype.kind in ("date", "timestamp"):
+        dates = np.asarray(values, dtype="datetime64[D]" if ctype.kind == "date" else "datetime64[ms]")
+        array = pa.array(dates, mask=np.isnat(dates))
+    elif ctype.kind == "uuid":
+        return _uuid_array(values, _null_mask(values))
+    else:
+        array = pa.array(values, type=pa.string())
+    return array.dictionary_encode() if ctype.dictionary else array
+
+
+class ParquetOutput(OutputFormat):
+    """
+    Parquet 形式の出力（pyarrow が必要）。
+
+    列の型は resolve_column_types で決めた型に合わせる（int は int64、date は date32、
+    timestamp はミリ秒の timestamp、uuid は UUID 型、それ以外は文字列）。ref / const の列は辞書型にして
+    辞書符号化する。チャンクは row_group_size 行ごとの行グループにまとめて書き出すため、
+    メモリに溜めるのは1行グループ分までになる。行グループごとに列の統計情報（最小値・最大値・null 数）も書く。
+    0件のテーブルは、列の型から作ったスキーマだけの（行グループのない）ファイルにする。
+    パートファイルの連結でも、行グループを row_group_size 行に詰め直す。
+
+    Args:
+        compression: 圧縮方式（PARQUET_COMPRESSIONS のいずれか）
+        row_group_size: 1行グループあたりの行数
+        level: 圧縮レベル（省略時は圧縮方式の既定値）
+        queue_depth: 書き出しキューに溜める行グループ数の上限
+    """
+    suffix = ".parquet"
+
+    def __init__(self, compression: str = "snappy", row_group_size: int = ROW_GROUP_SIZE, level: Optional[int] = None,
+                 queue_depth: int = WRITE_QUEUE_DEPTH):
+        if pq is None:
+            raise RuntimeError("[ERROR] Parquet 形式の出力には pyarrow が必要です（pip install pyarrow）")
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.level = level
+        self.queue_depth = queue_depth
+
+    def _writer(self, path: Path, schema: "pa.Schema") -> "pq.ParquetWriter":
+        dictionary = [field.name for field in schema if pa.types.is_dictionary(field.type)]
+        return pq.ParquetWriter(path, schema, compression=self.compression, compression_level=self.level,
+                                use_dictionary=dictionary, write_statistics=True)
+
+    def _write_empty(self, path: Path, names: List[str], types: Optional[Dict[str, ColumnType]]) -> None:
+        """列の型から作ったスキーマだけの Parquet ファイルを書く。"""
+        types = types or {}
+        empty = pa.table({name: arrow_column([], types.get(name, ColumnType("string"))) for name in names})
+        self._writer(path, empty.schema).close()
+
+    def _row_groups(self, tables: Iterable["pa.Table"]) -> Iterator["pa.Table"]:
+        """
+        テーブルを順に溜め、row_group_size 行の倍数ごとにまとめて返す（端数は最後に返す）。
+
+        Args:
+            tables: 連結する Arrow テーブルのイテレータ
+
+        Returns:
+            書き出す Arrow テーブルのイテレータ
+        """
+        pending = []
+        pending_rows = 0
+        for table in tables:
+            pending.append(table)
+            pending_rows += table.num_rows
+            if pending_rows >= self.row_group_size:
+                table = pa.concat_tables(pending).unify_dictionaries()
+                full = pending_rows - pending_rows % self.row_group_size
+                pending = [table.slice(full)]
+                pending_rows -= full
+                yield table.slice(0, full)
+        if pending_rows:
+            yield pa.concat_tables(pending).unify_dictionaries()
+
+    def write(self, path, chunks, types=None, header=True, timings=None, schema=None):
+        timings = StageTimes() if timings is None else timings
+        started = time.perf_counter()
+        types = types or {}
+        rows = 0
+        names = []
+        writer = out = None
+        pending = []
+        pending_rows = 0
+        try:
+            try:
+                for chunk in timings.timed(chunks):
+                    n = table_length(chunk)
+                    if not n:
+                        continue
+                    encode_start = time.perf_counter()
+                    batch = pa.table({name: arrow_column(values, types.get(name)) for name, values in chunk.items()})
+                    if writer is None:
+                        names = list(chunk.keys())
+                        writer = self._writer(path, batch.schema)
+                        out = BackgroundWriter(lambda table: writer.write_table(table, row_group_size=self.row_group_size),
+                                               self.queue_depth, timings)
+                    pending.append(batch)
+                    pending_rows += n
+                    rows += n
+                    table = None
+                    if pending_rows >= self.row_group_size:
+                        # 行グループの大きさにそろえて書き、端数は次のチャンクと合わせる
+                        table = pa.concat_tables(pending).unify_dictionaries()
+                        full = pending_rows - pending_rows % self.row_group_size
+                        pending = [table.slice(full)]
+                        pending_rows -= full
+                        table = table.slice(0, full)
+                    timings.encode += time.perf_counter() - encode_start
+                    if table is not None:
+                        out.write(table)
+                if pending_rows:
+                    out.write(pa.concat_tables(pending).unify_dictionaries())
+            finally:
+                if out is not None:
+                    out.close()
+            if writer is None and header and types:
+                names = list(types)
+                self._write_empty(path, names, types)
+        finally:
+            if writer is not None:
+                writer.close()
+            timings.wall += time.perf_counter() - started
+        return rows, names
+
+    def merge(self, path, names, parts, types=None, schema=None):
+        def row_groups():
+            for part in parts:
+                if names and part.exists():
+                    source = pq.ParquetFile(part)
+                    for i in range(source.metadata.num_row_groups):
+                        yield source.read_row_group(i)
+
+        writer = None
+        try:
+            for table in self._row_groups(row_groups()):
+                if writer is None:
+                    writer = self._writer(path, table.schema)
+                writer.write_table(table, row_group_size=self.row_group_size)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None and names:
+            self._write_empty(path, names, types)
+        for part in parts:
+            if part.exists():
+                part.unlink()
+
+
+class NullOutput(OutputFormat):
+    """ファイルを書き出さない出力（--sqlite などの読み込み先だけに出力する場合に使う）。"""
+    suffix = ""
+
+    def write(self, path, chunks, types=None, header=True, timings=None, schema=None):
+        timings = StageTimes() if timings is None else timings
+        started = time.perf_counter()
+        rows = 0
+        names = list(types) if types else []
+        for chunk in timings.timed(chunks):
+            rows += table_length(chunk)
+            names = names or list(chunk.keys())
+        timings.wall += time.perf_counter() - started
+        return rows, names
+
+    def merge(self, path, names, parts, types=None, schema=None):
+        pass
+
+
+SQLITE_TYPES = {"int": "INTEGER", "date": "TEXT", "timestamp": "TEXT", "uuid": "TEXT", "string": "TEXT"}
+POSTGRES_TYPES = {"int": "BIGINT", "date": "DATE", "timestamp": "TIMESTAMP", "uuid": "UUID", "string": "TEXT"}
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+)
+
+
+def _sql_name(name: str) -> str:
+    """テーブル名・列名をダブルクォートで囲んだ識別子にする。"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def primary_key_fields(schema: Dict[str, Any]) -> List[str]:
+    """
+    テーブルの主キーの列名を返す。
+
+    Args:
+        schema: テーブル定義
+
+    Returns:
+        primary_key の列名（pointer で primary_key がない場合は key）のリスト
+    """
+    key = schema.get("primary_key", schema.get("key") if schema["type"] == "pointer" else None) or []
+    return [key] if isinstance(key, str) else list(key)
+
+
+def index_fields(schema: Dict[str, Any], types: Dict[str, ColumnType]) -> List[List[str]]:
+    """
+    読み込み後に作る副次インデックスの列を返す。
+
+    ref の列、子テーブルの parent_key、スキーマの indexes に書いた列の組にインデックスを作る
+    （主キーの先頭の列と同じものは除く）。親テーブルからコピーした ref の列は parent_key で代表する。
+
+    Args:
+        schema: テーブル定義
+        types: 列名をキーとする列の型
+
+    Returns:
+        インデックスごとの列名のリスト
+    """
+    key = primary_key_fields(schema)
+    indexes = [[name] for name, field_def in schema.get("fields", {}).items()
+               if isinstance(field_def, dict) and field_def.get("type") == "ref" and field_def["table"] != schema.get("parent")]
+    parent_key = schema.get("parent_key")
+    if parent_key:
+        indexes.append([parent_key] if isinstance(parent_key, str) else list(parent_key))
+    for index in schema.get("indexes", []):
+        indexes.append([index] if isinstance(index, str) else list(index))
+    result = []
+    for index in indexes:
+        if index != key[:len(index)] and index not in result and all(name in types for name in index):
+            result.append(index)
+    return result
+
+
+def table_ddl(table_name: str, schema: Dict[str, Any], types: Dict[str, ColumnType],
+              type_names: Dict[str, str] = SQLITE_TYPES, constraints: bool = True) -> str:
+    """
+    列の型と主キーから CREATE TABLE 文を作る。
+
+    Args:
+        table_name: 作るテーブル名
+        schema: テーブル定義
+        types: 列名をキーとする列の型（この順に列を並べる）
+        type_names: 列の型をキーとする SQL の型名（SQLITE_TYPES / POSTGRES_TYPES）
+        constraints: 主キーと NOT NULL を付ける場合は True（シャードの一時テーブルでは付けない）
+
+    Returns:
+        CREATE TABLE 文
+    """
+    columns = []
+    for name, ctype in types.items():
+        column = f"{_sql_name(name)} {type_names[ctype.kind]}"
+        if constraints and not ctype.nullable:
+            column += " NOT NULL"
+        columns.append(column)
+    key = primary_key_fields(schema)
+    if constraints and key:
+        columns.append(f"PRIMARY KEY ({', '.join(map(_sql_name, key))})")
+    return f"CREATE TABLE {_sql_name(table_name)} ({', '.join(columns)})"
+
+
+SQL_MODES = ("insert", "copy")
+SQL_BATCH_SIZE = 1000
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+class SqlDumpOutput(StreamOutput):
+    """
+    テーブルごとの SQL スクリプト（`.sql`）の出力。
+
+    先頭にスキーマから作った DROP TABLE / CREATE TABLE（PostgreSQL の型、primary_key と NOT NULL 付き）を書き、
+    全体を1トランザクションにする。行は mode に応じて次のどちらかで書く。
+
+    - insert: batch_size 行ずつの複数行 `INSERT ... VALUES`。int の列はそのまま、それ以外は単引用符で囲む
+    - copy: チャンクごとの PostgreSQL の `COPY ... FROM stdin` のテキストブロック（psql で読み込む）
+
+    エスケープは列ごとにまとめて判定し、エスケープが必要な文字を含む列だけを
+    str.replace / str.translate（COPY_ESCAPES）で変換する。
+
+    Args:
+        mode: 行の書き方（SQL_MODES のいずれか）
+        batch_size: insert で1つの INSERT 文にまとめる行数
+        compression: 圧縮方式（CSV_COMPRESSIONS のいずれか）。None の場合は圧縮しない
+        level: 圧縮レベル
+        threads: 圧縮に使うスレッド数（省略時は CPU 数）
+        queue_depth: 書き出しキューに溜めるチャンク数の上限
+    """
+    extension = ".sql"
+
+    def __init__(self, mode: str = "insert", batch_size: int = SQL_BATCH_SIZE, compression: Optional[str] = None,
+                 level: Optional[int] = None, threads: Optional[int] = None, queue_depth: int = WRITE_QUEUE_DEPTH):
+        super().__init__(compression, level, threads, queue_depth)
+        self.mode = mode
+        self.batch_size = batch_size
+
+    def _header(self, names, types, schema):
+        table_name = schema["table_name"]
+        return (
+            f"BEGIN;\nDROP TABLE IF EXISTS {_sql_name(table_name)};\n"
+            f"{table_ddl(table_name, schema, types, POSTGRES_TYPES)};\n"
+        ).encode("utf-8")
+
+    def _footer(self, schema):
+        return b"COMMIT;\n"
+
+    def _body(self, columns, names, types, schema):
+        table = f"{_sql_name(schema['table_name'])} ({', '.join(map(_sql_name, names))})"
+        if self.mode == "copy":
+            texts = []
+            for column in columns:
+                column = column_texts(column, NULL_MARK)
+                joined = "".join(column)
+                if any(c in joined for c in "\\\t\n\r"):
+                    column = [t.translate(COPY_ESCAPES) for t in column]
+                texts.append(column)
+            # None の目印はエスケープ後に \N にする（値に含まれる \ はすでに \\ になっている）
+            text = "\n".join(map("\t".join, zip(*texts)))
+            if NULL_MARK in text:
+                text = text.replace(NULL_MARK, "\\N")
+            return f"COPY {table} FROM stdin;\n{text}\n\\.\n".encode("utf-8")
+
+        texts = []
+        for column, name in zip(columns, names):
+            column = column_texts(column, NULL_MARK)
+            ctype = types.get(name)
+            if ctype is None or ctype.kind != "int":
+                if "'" in "".join(column):
+                    column = [t.replace("'", "''") for t in column]
+                column = ["'" + t + "'" for t in column]
+            texts.append(column)
+        statements = []
+        for start in range(0, len(texts[0]), self.batch_size):
+            batch = [column[start:start + self.batch_size] for column in texts]
+            statements.append(f"INSERT INTO {table} VALUES\n(" + "),\n(".join(map(", ".join, zip(*batch))) + ");\n")
+        text = "".join(statements)
+        if NULL_MARK in text:
+            text = text.replace(f"'{NULL_MARK}'", "NULL").replace(NULL_MARK, "NULL")
+        return text.encode("utf-8")
+
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+PG_EPOCH = np.datetime64("2000-01-01T00:00:00", "us")
+PG_BINARY_WIDTHS = {"int": 8, "date": 4, "timestamp": 8, "uuid": 16}
+
+
+def pg_binary_field(values: Sequence, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    1列分の値を、PostgreSQL のバイナリ COPY の値の表現にする。
+
+    int は int8、date は 2000-01-01 からの日数（int4）、timestamp は 2000-01-01 00:00:00 からの
+    マイクロ秒（int8）、uuid は 16 バイト、それ以外は UTF-8 の text として、いずれもビッグエンディアンで列ごとにまとめて変換する。
+
+    Args:
+        values: 生成した列
+        kind: 列の型（ColumnType.kind）
+
+    Returns:
+        (各行の値のバイト数（None は -1）, None 以外の値のバイト列を行順に連結した uint8 配列)
+    """
+    n = len(values)
+    if kind in ("date", "timestamp"):
+        stamps = np.asarray(values, dtype="datetime64[D]" if kind == "date" else "datetime64[us]")
+        mask = np.isnat(stamps)
+        if kind == "date":
+            data = (stamps[~mask] - PG_EPOCH.astype("datetime64[D]")).astype(">i4")
+        else:
+            data = (stamps[~mask] - PG_EPOCH).astype(">i8")
+    elif kind == "int":
+        mask = _null_mask(values)
+        data = (_object_array(values)[~mask] if mask.any() else np.asarray(values)).astype(">i8")
+    elif kind == "uuid":
+        mask = _null_mask(values)
+        data = uuid_bytes(values, mask)[~mask]
+    else:
+        mask = _null_mask(values)
+        texts = column_texts(values)
+        joined = "".join(texts)
+        encoded = joined.encode("utf-8")
+        if len(encoded) == len(joined):
+            lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        else:
+            lengths = np.fromiter((len(t.encode("utf-8")) for t in texts), dtype=np.int64, count=n)
+        lengths[mask] = -1
+        return lengths, np.frombuffer(encoded, dtype=np.uint8)
+    lengths = np.where(mask, -1, PG_BINARY_WIDTHS[kind]).astype(np.int64)
+    return lengths, np.ascontiguousarray(data).view(np.uint8).ravel()
+
+
+def pg_binary_tuples(fields: List[Tuple[np.ndarray, np.ndarray]], n: int) -> bytes:
+    """
+    列ごとの値を、バイナリ COPY のタプル（int16 の列数に続けて、列ごとに int32 のバイト数と値）の並びにする。
+
+    各行・各列の書き込み位置を先に計算し、列ごとに値のバイト列を出力バッファへまとめて書き込む。
+
+    Args:
+        fields: pg_binary_field で変換した列のリスト（出力する順）
+        n: 行数
+
+    Returns:
+        n 行分のタプルのバイト列
+    """
+    sizes = [np.maximum(lengths, 0) for lengths, _ in fields]
+    row_sizes = np.full(n, 2, dtype=np.int64)
+    for size in sizes:
+        row_sizes += 4 + size
+    starts = np.cumsum(row_sizes) - row_sizes
+    out = np.empty(int(row_sizes.sum()), dtype=np.uint8)
+    out[starts[:, None] + np.arange(2)] = np.frombuffer(struct.pack(">h", len(fields)), dtype=np.uint8)
+    position = starts + 2
+    for (lengths, data), size in zip(fields, sizes):
+        out[position[:, None] + np.arange(4)] = lengths.astype(">i4").view(np.uint8).reshape(n, 4)
+        position += 4
+        width = int(size[0]) if n else 0
+        if (size == width).all():
+            # 全行が同じ幅（None のない固定長の型）なら、2次元の位置でまとめて書く
+            out[position[:, None] + np.arange(width)] = data.reshape(n, width)
+        else:
+            offsets = np.cumsum(size) - size
+            out[np.repeat(position - offsets, size) + np.arange(len(data))] = data
+        position += size
+    return out.tobytes()
+
+
+class PgBinaryOutput(StreamOutput):
+    """
+    PostgreSQL のバイナリ COPY 形式（`COPY ... FROM ... WITH (FORMAT binary)`）の出力。
+
+    ファイルは署名・フラグ・ヘッダー拡張領域からなるヘッダーで始まり、行ごとのタプルが続き、
+    int16 の -1 で終わる。値は列の型に合わせたバイナリ表現（POSTGRES_TYPES の型）で、
+    生成した列から NumPy でまとめて組み立てる。読み込み先のテーブルは同じ型で作っておく必要がある。
+
+    Args:
+        compression: 圧縮方式（CSV_COMPRESSIONS のいずれか）。None の場合は圧縮しない
+        level: 圧縮レベル
+        threads: 圧縮に使うスレッド数（省略時は CPU 数）
+        queue_depth: 書き出しキューに溜めるチャンク数の上限
+    """
+    extension = ".pgcopy"
+
+    def _header(self, names, types, schema):
+        return PGCOPY_HEADER
+
+    def _footer(self, schema):
+        return PGCOPY_TRAILER
+
+    def _body(self, columns, names, types, schema):
+        fields = [pg_binary_field(column, types[name].kind if name in types else "string")
+                  for column, name in zip(columns, names)]
+        return pg_binary_tuples(fields, len(columns[0]))
+
+
+def _json_default(value: Any) -> Any:
+    """標準の json モジュールで書けない値（日付・NumPy の値）を変換する。"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"JSON に変換できない値です: {value!r}")
+
+
+def json_line(value: Any) -> bytes:
+    """
+    1件の値を、改行を含まない JSON のバイト列にする（orjson があれば orjson を使う）。
+
+    Args:
+        value: JSON にする値
+
+    Returns:
+        UTF-8 の JSON のバイト列
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+class JsonlOutput(StreamOutput):
+    """
+    JSON Lines 形式（1行1オブジェクト）の出力。
+
+    列は Python の値に戻してから行ごとの辞書にし、orjson（ない場合は json モジュール）でまとめて変換する。
+    int の列は数値、None は null になる。embed_children で作った親のドキュメントのチャンクでは、
+    子テーブル名の列に子レコードの辞書の配列が入る。
+
+    Args:
+        compression: 圧縮方式（CSV_COMPRESSIONS のいずれか）。None の場合は圧縮しない
+        level: 圧縮レベル
+        threads: 圧縮に使うスレッド数（省略時は CPU 数）
+        queue_depth: 書き出しキューに溜めるチャンク数の上限
+    """
+    extension = ".jsonl"
+
+    def _body(self, columns, names, types, schema):
+        rows = [dict(zip(names, row)) for row in zip(*map(_as_list, columns))]
+        return b"\n".join(map(json_line, rows)) + b"\n"
+
+
+class SqliteTarget:
+    """
+    生成したデータを、CSV などの出力と同じパスで SQLite のデータベースに読み込む出力先。
+
+    テーブルは列の型（INTEGER / TEXT）と primary_key を主キーとして作り直し、チャンクごとに
+    1トランザクションで executemany する。ジャーナル・同期書き込みを止める PRAGMA を設定し、
+    副次インデックスはデータを読み込んだ後に作る。主キーなどの制約に違反した行があるとエラーにする。
+    skip_duplicates を指定した場合は、違反した行を読み込まずに（INSERT OR IGNORE）テーブルごとの件数を表示する。
+
+    並列生成では、ワーカーごとにシャード専用の一時データベース（制約なし）に書き、
+    メインプロセスでシャード順に本体のテーブルへ INSERT ... SELECT で移す。
+
+    Args:
+        path: データベースファイルのパス
+        skip_duplicates: True の場合、制約に違反した行をエラーにせず読み込まない
+    """
+
+    def __init__(self, path: Path, skip_duplicates: bool = False):
+        self.path = path
+        self.skip_duplicates = skip_duplicates
+
+    def connect(self, path: Optional[Path] = None) -> sqlite3.Connection:
+        """読み込み用の PRAGMA を設定した接続を開く（トランザクションは明示的に張る）。"""
+        conn = sqlite3.connect(path or self.path, isolation_level=None)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def part_path(self, shard: Shard) -> Path:
+        """シャード専用の一時データベースのパスを返す。"""
+        return self.path.with_name(f"{self.path.name}.{shard.table_name}.part-{shard.index:05d}")
+
+    def _insert(self, conn: sqlite3.Connection, table_name: str, sql: str, rows: Optional[Iterable[Sequence]] = None) -> None:
+        """
+        1トランザクションで行を読み込む。制約に違反した場合はロールバックしてエラーにする。
+
+        Args:
+            conn: 接続
+            table_name: テーブル名
+            sql: INSERT 文
+            rows: sql のパラメータの行（INSERT ... SELECT の場合は None）
+        """
+        conn.execute("BEGIN")
+        try:
+            if rows is None:
+                conn.execute(sql)
+            else:
+                conn.executemany(sql, rows)
+        except sqlite3.IntegrityError as e:
+            conn.execute("ROLLBACK")
+            raise ValueError(
+                f"[ERROR] {table_name}: 主キーなどの制約に違反する行があるため SQLite に読み込めません（{e}）。"
+                "違反した行を読み込まずに続けるには --sqlite-skip-duplicates を指定してください"
+            ) from e
+        conn.execute("COMMIT")
+
+    def _finish(self, conn: sqlite3.Connection, job: "TableJob", rows: int, loaded: int) -> None:
+        table_name = job.schema["table_name"]
+        for index in index_fields(job.schema, job.types):
+            index_name = _sql_name(f"{table_name}__{'__'.join(index)}")
+            conn.execute(f"CREATE INDEX {index_name} ON {_sql_name(table_name)} ({', '.join(map(_sql_name, index))})")
+        if loaded < rows:
+            print(f"[WARN]   {table_name}: 主キーの重複などの制約に違反した {rows - loaded} 行を SQLite に読み込みませんでした")
+
+    def load(self, job: "TableJob", chunks: Iterable[Dict[str, Sequence]], shard: Optional[Shard] = None) -> Iterator[Dict[str, Sequence]]:
+        """
+        チャンクをそのまま流しつつ、SQLite のテーブルに読み込む。
+
+        Args:
+            job: 生成ジョブ
+            chunks: 列名をキーとする列の辞書のイテレータ
+            shard: 指定した場合は、シャード専用の一時データベースに制約なしのテーブルとして書く
+
+        Returns:
+            受け取ったチャンクをそのまま返すイテレータ
+        """
+        table_name = job.schema["table_name"]
+        names = list(job.types)
+        insert = (
+            f"INSERT{' OR IGNORE' if shard is None and self.skip_duplicates else ''} INTO {_sql_name(table_name)} "
+            f"VALUES ({', '.join('?' * len(names))})"
+        )
+        conn = self.connect(None if shard is None else self.part_path(shard))
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {_sql_name(table_name)}")
+            conn.execute(table_ddl(table_name, job.schema, job.types, constraints=shard is None))
+            rows = 0
+            before = conn.total_changes
+            for chunk in chunks:
+                if table_length(chunk):
+                    self._insert(conn, table_name, insert, iter_rows({name: chunk[name] for name in names}))
+                    rows += table_length(chunk)
+                yield chunk
+            if shard is None:
+                self._finish(conn, job, rows, conn.total_changes - before)
+        finally:
+            conn.close()
+
+    def merge(self, job: "TableJob", shards: List[Shard]) -> None:
+        """
+        シャードの一時データベースを、シャード順に本体のテーブルへ移して削除する。
+
+        Args:
+            job: 生成ジョブ
+            shards: シャード順に並んだシャード
+        """
+        table_name = _sql_name(job.schema["table_name"])
+        conn = self.connect()
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+            conn.execute(table_ddl(job.schema["table_name"], job.schema, job.types))
+            rows = 0
+            before = conn.total_changes
+            for shard in shards:
+                part = self.part_path(shard)
+                if not part.exists():
+                    continue
+                conn.execute("ATTACH DATABASE ? AS part", (str(part),))
+                rows += conn.execute(f"SELECT count(*) FROM part.{table_name}").fetchone()[0]
+                insert = f"INSERT{' OR IGNORE' if self.skip_duplicates else ''} INTO main.{table_name} SELECT * FROM part.{table_name}"
+                self._insert(conn, job.schema["table_name"], insert)
+                conn.execute("DETACH DATABASE part")
+                part.unlink()
+            self._finish(conn, job, rows, conn.total_changes - before)
+        finally:
+            conn.close()
+
+
+def _keep_columns(chunks: Iterable[Dict[str, Sequence]], fields: Optional[Iterable[str]],
+                  kept: List[Dict[str, Sequence]]) -> Iterator[Dict[str, Sequence]]:
+    """
+    チャンクをそのまま流しつつ、指定した列だけを kept に溜める。
+
+    Args:
+        chunks: 列名をキーとする列の辞書のイテレータ
+        fields: 溜めておく列名（None の場合はすべての列）
+        kept: 指定した列だけのチャンクを溜めるリスト（この関数が追記する）
+
+    Returns:
+        受け取ったチャンクをそのまま返すイテレータ
+    """
+    fields = None if fields is None else sorted(fields)
+    for chunk in chunks:
+        if fields is None:
+            kept.append(chunk)
+        elif fields:
+            kept.append({field: chunk[field] for field in fields})
+        yield chunk
+
+
+def nested_children(ordered: List[Dict[str, Any]]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+    """
+    親のドキュメントに埋め込む子テーブルを決める。
+
+    親テーブルごとに最初の子テーブルだけを埋め込む。2つ目以降の子テーブルと、
+    埋め込まれるテーブル自身の子テーブルは、埋め込まずにそのまま書き出す。
+
+    Args:
+        ordered: resolve_dependencies で並べ替えたスキーマ定義のリスト
+
+    Returns:
+        (子テーブル名をキー、埋め込み先の親テーブル名を値とする辞書, 埋め込まない (子テーブル名, 親テーブル名) のリスト)
+    """
+    nest = {}
+    skipped = []
+    for schema in ordered:
+        if not _is_child(schema):
+            continue
+        table_name, parent = schema["table_name"], schema["parent"]
+        if parent in nest or parent in nest.values():
+            skipped.append((table_name, parent))
+            continue
+        nest[table_name] = parent
+    return nest, skipped
+
+
+def _documents(parents: ColumnTable, start: int, stop: int, counts: np.ndarray, chunk: Optional[Dict[str, Sequence]],
+               child_table: str) -> Dict[str, Sequence]:
+    """
+    親レコード start から stop の手前までを、子レコードを埋め込んだドキュメントのチャンクにする。
+
+    Args:
+        parents: 親テーブル
+        start: 先頭の親レコードの位置
+        stop: 末尾の次の位置
+        counts: 親レコードごとの子レコード件数
+        chunk: 子レコードの列（親レコードの順に counts 件ずつ並ぶ。子レコードがない場合は None）
+        child_table: 子テーブル名（ドキュメントで子レコードの配列を入れるキー）
+
+    Returns:
+        親テーブルの列と、子レコードの辞書のリストの列を持つ辞書
+    """
+    index = np.arange(start, stop)
+    documents = {name: parents.take(name, index) for name in parents}
+    if chunk is None:
+        documents[child_table] = [[] for _ in range(stop - start)]
+        return documents
+    names = list(chunk.keys())
+    rows = [dict(zip(names, row)) for row in zip(*(_as_list(chunk[name]) for name in names))]
+    ends = np.cumsum(counts).tolist()
+    documents[child_table] = [rows[end - count:end] for end, count in zip(ends, counts.tolist())]
+    return documents
+
+
+def embed_children(schema: Dict[str, Any], chunks: Iterable[Dict[str, Sequence]],
+                   shards: List[Shard]) -> Iterator[Dict[str, Sequence]]:
+    """
+    子テーブルのチャンクを、親レコード1件を1ドキュメントとして子レコードを埋め込んだチャンクに変える。
+
+    子レコードは親レコードの順に生成され、チャンクの区切りも親レコードの区切りにそろう。
+    親レコードごとの件数はシャードから引き直せる（_child_counts）ため、結合はチャンクごとに
+    切り分けるだけで済み、子テーブル全体を溜める必要はない。
+
+    Args:
+        schema: 子テーブルの定義
+        chunks: 子テーブルの列名をキーとする列の辞書のイテレータ（shards の順に生成したもの）
+        shards: 生成したシャード（DATA の親テーブルは shards[0].parent_offset から始まる）
+
+    Returns:
+        ドキュメントのチャンクのイテレータ
+    """
+    parents = DATA[schema["parent"]]
+    if not isinstance(parents, ColumnTable):
+        parents = ColumnTable(parents)
+    if not shards:
+        return
+    counts = np.concatenate([_child_counts(schema, shard) for shard in shards])
+    first = shards[0].start - shards[0].parent_offset
+    ends = np.cumsum(counts)
+    done = rows = 0
+    for chunk in chunks:
+        n = table_length(chunk)
+        if not n:
+            continue
+        # 子レコードのない親レコードは、直前の親レコードと同じチャンクに入れる
+        stop = int(np.searchsorted(ends, rows + n, side="right"))
+        yield _documents(parents, first + done, first + stop, counts[done:stop], chunk, schema["table_name"])
+        done, rows = stop, rows + n
+    if done < len(counts):
+        yield _documents(parents, first + done, first + len(counts), counts[done:], None, schema["table_name"])
+
+
+def dependency_levels(ordered: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    依存関係グラフを、互いに独立なテーブルの段（レベル）に分ける。
+
+    各テーブルのレベルは、依存先テーブルの最大レベル + 1 になる。
+    同じレベルのテーブルは、それより前のレベルがすべて終わっていれば同時に生成できる。
+
+    Args:
+        ordered: resolve_dependencies で並べ替えたスキーマ定義のリスト
+
+    Returns:
+        レベル順のスキーマ定義のリストのリスト
+    """
+    graph = dependency_graph(ordered)
+    level = {}
+    levels = []
+    for schema in ordered:
+        name = schema["table_name"]
+        level[name] = max((level[dep] + 1 for dep in graph.get(name, ())), default=0)
+        if level[name] == len(levels):
+            levels.append([])
+        levels[level[name]].append(schema)
+    return levels
+
+
+class RunSettings(NamedTuple):
+    """
+    1回の実行で全テーブル（ワーカープロセスを含む）に共通する設定。
+
+    Attributes:
+        output_dir: 出力先ディレクトリ
+        chunk_size: 1チャンクあたりの目安の行数
+        seed: 乱数のシード（未指定の実行でも、実行開始時に決めた値が入る）
+        as_of: `now` / `today` として扱う実行開始時刻
+        shard_size: 1シャードあたりの目安の行数
+        output: 出力形式
+        sqlite: 出力と同時にデータを読み込む SQLite のデータベース（読み込まない場合は None）
+        nest: 親のドキュメントに埋め込む子テーブル名をキー、親テーブル名を値とする辞書（nested_children の結果の1つ目）
+    """
+    output_dir: Path
+    chunk_size: int
+    seed: int
+    as_of: datetime
+    shard_size: int = SHARD_SIZE
+    output: OutputFormat = CsvOutput()
+    sqlite: Optional[SqliteTarget] = None
+    nest: Optional[Dict[str, str]] = None
+
+
+class TableJob(NamedTuple):
+    """
+    1テーブル分の生成ジョブ。
+
+    Attributes:
+        schema: テーブル定義
+        keep: 書き出し後に残す列名（None の場合はすべての列）
+        pool_fields: ref プールを作る列名
+        retain: 後続のテーブルが行単位で参照するため、DATA に残す場合は True
+        types: 列名をキーとする出力列の型（CSV では使わない）
+    """
+    schema: Dict[str, Any]
+    keep: Optional[Set[str]]
+    pool_fields: Set[str]
+    retain: bool
+    types: Optional[Dict[str, ColumnType]] = None
+
+
+def build_jobs(ordered: List[Dict[str, Any]], nest: Optional[Dict[str, str]] = None) -> Dict[str, TableJob]:
+    """
+    テーブルごとに、書き出し後に残す列を決めた生成ジョブを作る。
+
+    Args:
+        ordered: resolve_dependencies で並べ替えたスキーマ定義のリスト
+        nest: 親のドキュメントに埋め込む子テーブル（埋め込み先の親テーブルは、子テーブルと一緒に書き出すためすべての列を残す）
+
+    Returns:
+        テーブル名をキーとする生成ジョブの辞書
+    """
+    ref_fields = collect_ref_fields(ordered)
+    row_consumers = collect_row_consumers(ordered)
+    required_columns = collect_required_columns(ordered)
+    for parent in (nest or {}).values():
+        required_columns[parent] = None
+    types = resolve_column_types(ordered)
+    jobs = {}
+    for schema in ordered:
+        table_name = schema["table_name"]
+        pool_fields = ref_fields.get(table_name, set())
+        if table_name in row_consumers:
+            keep = required_columns[table_name]
+            keep = None if keep is None else keep | pool_fields
+            jobs[table_name] = TableJob(schema, keep, pool_fields, True, types[table_name])
+        else:
+            jobs[table_name] = TableJob(schema, pool_fields, pool_fields, False, types[table_name])
+    return jobs
+
+
+def _retained(job: TableJob, kept: Union[List[Dict[str, Sequence]], TableBuilder]) -> Tuple[Optional[ColumnTable], Dict[str, StoredColumn]]:
+    """
+    書き出し時に残した列から、DATA に残すテーブルと ref プールを作る。
+
+    Args:
+        job: 生成ジョブ
+        kept: 残した列のチャンクのリスト、またはチャンクを溜めた TableBuilder
+
+    Returns:
+        (DATA に残すテーブル, ref プールの辞書)。DATA に残さないテーブルは None
+    """
+    if not kept:
+        # 0件のテーブルも、子テーブル・ref から参照できるよう空の列として残す
+        names = list(job.types or ()) if job.keep is None else sorted(job.keep)
+        kept = [{name: [] for name in names}]
+    if isinstance(kept, TableBuilder):
+        table = kept.build()
+        pools = {field: table.columns[field] for field in job.pool_fields}
+        return (table if job.retain else None), pools
+    if job.retain:
+        table = ColumnTable(concat_columns(kept))
+        return table, {field: table.columns[field] for field in job.pool_fields}
+    columns = concat_columns(kept)
+    return None, {field: encode_column(columns[field]) for field in job.pool_fields}
+
+
+def output_for(job: TableJob, settings: RunSettings) -> Tuple[OutputFormat, str]:
+    """
+    テーブルの書き出しに使う出力形式と、出力ファイルのテーブル名を返す。
+
+    親のドキュメントに埋め込む子テーブルは親テーブルのファイルに書き、
+    埋め込み先の親テーブル自体は（子テーブルと一緒に書き出すため）ファイルに書かない。
+
+    Args:
+        job: 生成ジョブ
+        settings: 実行設定
+
+    Returns:
+        (出力形式, 出力ファイルのテーブル名)
+    """
+    table_name = job.schema["table_name"]
+    nest = settings.nest or {}
+    if table_name in nest.values():
+        return NullOutput(), table_name
+    return settings.output, nest.get(table_name, table_name)
+
+
+def _output_chunks(job: TableJob, settings: RunSettings, chunks: Iterable[Dict[str, Sequence]],
+                   shards: List[Shard]) -> Tuple[Iterable[Dict[str, Sequence]], Optional[Dict[str, ColumnType]]]:
+    """
+    書き出すチャンクと列の型を返す。親のドキュメントに埋め込む子テーブルは、ドキュメントのチャンクにする。
+
+    Args:
+        job: 生成ジョブ
+        settings: 実行設定
+        chunks: 列名をキーとする列の辞書のイテレータ
+        shards: chunks を生成したシャード
+
+    Returns:
+        (書き出すチャンクのイテレータ, 列の型（ドキュメントの場合は None）)
+    """
+    if job.schema["table_name"] in (settings.nest or {}):
+        return embed_children(job.schema, chunks, shards), None
+    return chunks, job.types
+
+
+def run_table(job: TableJob, settings: RunSettings, plan: Optional[List[FieldPlan]] = None,
+              kept: Optional[Union[List[Dict[str, Sequence]], "TableBuilder"]] = None,
+              timings: Optional[StageTimes] = None) -> Tuple[Optional[ColumnTable], Dict[str, StoredColumn]]:
+    """
+    1テーブルをシャード順に生成して出力形式のファイルに書き出し、後続のテーブルが使うデータだけを返す。
+
+    Args:
+        job: 生成ジョブ
+        settings: 実行設定
+        plan: compile_schema で作成した生成計画（省略時はここでコンパイルする）
+        kept: 後続のテーブルが使う列を溜める先（省略時は新しいリスト）
+        timings: 段階ごとの所要時間を加算する先
+
+    Returns:
+        (DATA に残すテーブル, ref プールの辞書)。残すものがなければ None と空の辞書
+    """
+    schema = job.schema
+    if plan is None:
+        plan = compile_schema(schema)
+    shards = plan_shards(schema, settings.seed, settings.shard_size)
+    chunks = chain.from_iterable(iter_chunks(schema, plan, settings.chunk_size, shard) for shard in shards)
+    if settings.sqlite is not None:
+        chunks = settings.sqlite.load(job, chunks)
+
+    # 書き出したチャンクからは、後続のテーブルが使う列だけを残す
+    kept = [] if kept is None else kept
+    output, file_name = output_for(job, settings)
+    chunks, types = _output_chunks(job, settings, _keep_columns(chunks, job.keep, kept), shards)
+    output.write(settings.output_dir / f"{file_name}{output.suffix}", chunks, types, timings=timings, schema=schema)
+    return _retained(job, kept)
+
+
+def prepare_dependencies(schemas: List[Dict[str, Any]], table_name: str, seed: Optional[int] = None) -> None:
+    """
+    テーブルが依存する（ref・親・抽出元の）テーブルを、ファイルに書き出さずに生成して DATA / REF_POOLS に残す。
+
+    既に DATA / REF_POOLS にあるテーブルは生成し直さない。同じ seed で一度に生成した場合と同じ値になる。
+
+    Args:
+        schemas: 依存テーブルを含むスキーマ定義のリスト
+        table_name: 生成したいテーブル名
+        seed: 乱数のシード（省略時は OS のエントロピーから決める）
+    """
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    graph = dependency_graph(schemas)
+    needed, pending = set(), [table_name]
+    while pending:
+        for dependency in graph.get(pending.pop(), ()):
+            if dependency not in needed:
+                needed.add(dependency)
+                pending.append(dependency)
+    ordered = resolve_dependencies(schemas)
+    jobs = build_jobs(ordered)
+    generated = set(DATA) | {table for table, _ in REF_POOLS}
+    for schema in ordered:
+        name = schema["table_name"]
+        if name not in needed or name in generated:
+            continue
+        job = jobs[name]
+        plan = compile_schema(schema)
+        kept = []
+        for shard in plan_shards(schema, seed):
+            for _ in _keep_columns(iter_chunks(schema, plan, shard=shard), job.keep, kept):
+                pass
+        table, pools = _retained(job, kept)
+        if table is not None:
+            DATA[name] = table
+        for field, pool in pools.items():
+            REF_POOLS[(name, field)] = pool
+
+
+def part_path(output_dir: Path, shard: Shard, suffix: str = ".csv") -> Path:
+    """シャードのパートファイルのパスを返す。"""
+    return output_dir / f"{shard.table_name}{suffix}.part-{shard.index:05d}"
+
+
+def _run_shard_in_worker(job: TableJob, settings: RunSettings, shard: Shard, tables: Dict[str, ColumnTable],
+                         pools: Dict[Tuple[str, str], StoredColumn]) -> Tuple[int, List[str], Dict[str, Sequence], StageTimes]:
+    """
+    ワーカープロセスで1シャードを生成し、ヘッダーなしのパートファイルに書き出す。
+
+    子テーブルのシャードには、対象範囲の親レコードだけを切り出したテーブルを渡す。
+
+    Args:
+        job: 生成ジョブ
+        settings: 実行設定
+        shard: 生成するシャード
+        tables: 親テーブル・ポインタの抽出元として必要なテーブル
+        pools: ref フィールドが参照する ref プール
+
+    Returns:
+        (書き出した行数, 列名のリスト, 後続のテーブルが使う列の辞書, 段階ごとの所要時間)
+    """
+    global AS_OF
+    AS_OF = settings.as_of
+    DATA.update(tables)
+    REF_POOLS.update(pools)
+    try:
+        chunks = iter_chunks(job.schema, chunk_size=settings.chunk_size, shard=shard)
+        if settings.sqlite is not None:
+            chunks = settings.sqlite.load(job, chunks, shard)
+        kept = []
+        output, _ = output_for(job, settings)
+        timings = StageTimes()
+        chunks, types = _output_chunks(job, settings, _keep_columns(chunks, job.keep, kept), [shard])
+        rows, names = output.write(part_path(settings.output_dir, shard, output.suffix), chunks, types, header=False,
+                                   timings=timings, schema=job.schema)
+        return rows, names, concat_columns(kept) if kept else {}, timings
+    finally:
+        DATA.clear()
+        REF_POOLS.clear()
+
+
+def _job_inputs(schema: Dict[str, Any], shard: Optional[Shard] = None) -> Tuple[Dict[str, ColumnTable], Dict[Tuple[str, str], StoredColumn]]:
+    """
+    ワーカーに渡す、テーブルの生成に必要な依存データだけを集める。
+
+    Args:
+        schema: テーブル定義
+        shard: 子テーブルのシャード（指定すると親テーブルをその範囲だけに切り出す）
+
+    Returns:
+        (親・抽出元のテーブル, ref プール)
+    """
+    tables = {}
+    for name in (schema.get("parent"), schema.get("source_table")):
+        if name is not None and name in DATA:
+            tables[name] = DATA[name]
+    if shard is not None and _is_child(schema):
+        tables[schema["parent"]] = tables[schema["parent"]].slice(shard.start, shard.stop)
+    pools = {}
+    for field_def in schema.get("fields", {}).values():
+        if isinstance(field_def, dict) and field_def.get("type") == "ref":
+            key = (field_def["table"], field_def["field"])
+            if key in REF_POOLS:
+                pools[key] = REF_POOLS[key]
+    return tables, pools
+
+
+MANIFEST_VERSION = 2
+MANIFEST_FORMATS = {
+    "csv": CsvOutput,
+    "parquet": ParquetOutput,
+    "sql": SqlDumpOutput,
+    "pgcopy": PgBinaryOutput,
+    "jsonl": JsonlOutput,
+}
+
+
+def load_schemas(schema_dir: Path) -> List[Dict[str, Any]]:
+    """
+    スキーマディレクトリ内の YAML ファイルをファイル名順に読み込む。
+
+    Args:
+        schema_dir: スキーマディレクトリ
+
+    Returns:
+        スキーマ定義のリスト
+    """
+    schemas = []
+    for schema_file in sorted(schema_dir.glob("*.yaml")):
+        with open(schema_file, encoding="utf-8") as f:
+            schemas.append(yaml.safe_load(f))
+    return schemas
+
+
+def plan_manifest(schemas: List[Dict[str, Any]], seed: int, as_of: datetime,
+                  shard_size: int = SHARD_SIZE, chunk_size: int = CHUNK_SIZE, output_format: str = "csv") -> Dict[str, Any]:
+    """
+    全テーブルをシャードに分割し、複数ノードで生成するためのマニフェストを作る。
+
+    各エントリ（シャード）には、乱数の位置・連番の範囲・出力行数を記録する。
+    子テーブルの件数や immutable のバージョン数はカウンタ方式の乱数から直接求めるため、
+    行を生成せずに全テーブルの分割を決められる。
+
+    Args:
+        schemas: スキーマ定義のリスト
+        seed: 乱数のシード
+        as_of: `now` / `today` として扱う日時
+        shard_size: 1シャードあたりの目安の行数
+        chunk_size: 1チャンクあたりの目安の行数
+        output_format: 出力形式（MANIFEST_FORMATS のいずれか）
+
+    Returns:
+        マニフェスト（JSON に書き出せる辞書）
+    """
+    if output_format not in MANIFEST_FORMATS:
+        raise ValueError(f"[ERROR] 分散生成で使えない出力形式です: {output_format}（{' / '.join(MANIFEST_FORMATS)}）")
+    ordered = resolve_dependencies(schemas)
+    jobs = build_jobs(ordered)
+    table_rows: Dict[str, Optional[int]] = {}
+    tables = []
+    entries = []
+    for schema in ordered:
+        table_name = schema["table_name"]
+        parent_rows = None
+        if _is_child(schema):
+            parent_rows = table_rows[schema["parent"]]
+            if parent_rows is None:
+                raise ValueError(f"[ERROR] 行数が事前に決まらないテーブルを親とする子テーブルは分割できません: {table_name}")
+
+        ids = []
+        row_offset = 0
+        slots = _seq_slots(schema)
+        for shard in plan_shards(schema, seed, shard_size, parent_rows):
+            rows = shard_rows(schema, shard)
+            units = rows if _is_child(schema) else shard.stop - shard.start
+            ids.append(len(entries))
+            entries.append({
+                "id": len(entries),
+                "table": table_name,
+                "index": shard.index,
+                "start": shard.start,
+                "stop": shard.stop,
+                "rows_before": shard.rows_before,
+                "rows": rows,
+                "row_offset": row_offset,
+                "sequences": {
+                    pattern: [shard.rows_before * n + 1, (shard.rows_before + units) * n]
+                    for pattern, n in slots.items() if units
+                },
+            })
+            row_offset = None if rows is None else row_offset + rows
+        table_rows[table_name] = row_offset
+
+        job = jobs[table_name]
+        tables.append({
+            "table_name": table_name,
+            "schema": schema,
+            "keep": None if job.keep is None else sorted(job.keep),
+            "pool_fields": sorted(job.pool_fields),
+            "retain": job.retain,
+            "entries": ids,
+        })
+
+    return {
+        "version": MANIFEST_VERSION,
+        "seed": seed,
+        "as_of": as_of.isoformat(),
+        "shard_size": shard_size,
+        "chunk_size": chunk_size,
+        "format": output_format,
+        "tables": tables,
+        "entries": entries,
+    }
+
+
+def write_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    """マニフェストを JSON で書き出す（スキーマの YAML の日付型などは _tagged の型名付きの値にする）。"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=_manifest_value)
+
+
+def _manifest_value(value: Any) -> Any:
+    """JSON に書けない値を _tagged で変換する。変換できない値はエラーにする。"""
+    tagged = _tagged(value)
+    if tagged is value:
+        raise TypeError(f"[ERROR] マニフェストに書き出せない値です: {value!r}")
+    return tagged
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    """
+    マニフェストを読み込む。
+
+    Args:
+        path: マニフェストのパス
+
+    Returns:
+        マニフェスト
+    """
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f, object_hook=_untagged)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"[ERROR] 対応していないマニフェストのバージョンです: {manifest.get('version')}")
+    return manifest
+
+
+def _entry_shard(entry: Dict[str, Any], seed: int) -> Shard:
+    """マニフェストのエントリをシャードに戻す。"""
+    return Shard(entry["table"], entry["index"], entry["start"], entry["stop"], entry["rows_before"], seed)
+
+
+def manifest_output(manifest: Dict[str, Any]) -> OutputFormat:
+    """マニフェストに記録した出力形式を、既定の設定で作る。"""
+    return MANIFEST_FORMATS[manifest["format"]]()
+
+
+def marker_path(directory: Path, shard: Shard) -> Path:
+    """シャードの完了マーカーのパスを返す。"""
+    return directory / f"{shard.table_name}.part-{shard.index:05d}.done"
+
+
+def kept_path(directory: Path, shard: Shard) -> Path:
+    """後続のテーブルが使う列を保存するファイルのパスを返す。"""
+    return directory / f"{shard.table_name}.keep-{shard.index:05d}.npz"
+
+
+def _tagged(value: Any) -> Any:
+    """列の値を、型を保ったまま JSON に書ける値にする（日付・日時は型名付きの辞書にする）。"""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _untagged(value: Any) -> Any:
+    """_tagged で変換した値を元の型に戻す（型名付きでない辞書はそのまま返す）。"""
+    if isinstance(value, dict) and len(value) == 1:
+        if "$datetime" in value:
+            return datetime.fromisoformat(value["$datetime"])
+        if "$date" in value:
+            return date.fromisoformat(value["$date"])
+    return value
+
+
+def dump_kept(columns: Dict[str, StoredColumn]) -> bytes:
+    """
+    保存する列を、pickle を使わない npz 形式のバイト列にする。
+
+    型付きの配列はそのまま、object 配列（カテゴリや文字列の列）は JSON の UTF-8 バイト列を
+    uint8 の配列にして格納するため、読み込みでは allow_pickle=False のまま開ける。
+
+    Args:
+        columns: 列名をキーとする保存する列
+
+    Returns:
+        npz 形式のバイト列
+    """
+    arrays = {"names": np.frombuffer(json.dumps(list(columns), ensure_ascii=False).encode("utf-8"), dtype=np.uint8)}
+    for i, column in enumerate(columns.values()):
+        for part, values in (("values", column.values), ("categories", column.categories)):
+            if values is None:
+                continue
+            if values.dtype == object:
+                text = json.dumps([_tagged(value) for value in values], ensure_ascii=False)
+                arrays[f"{i}.{part}.json"] = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+            else:
+                arrays[f"{i}.{part}"] = np.asarray(values)
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def load_kept(path: Path) -> Dict[str, StoredColumn]:
+    """
+    dump_kept で保存した列を読み込む。
+
+    Args:
+        path: 保存したファイルのパス
+
+    Returns:
+        列名をキーとする列
+    """
+    with np.load(path, allow_pickle=False) as data:
+        def array(key: str) -> Optional[np.ndarray]:
+            if key in data.files:
+                return data[key]
+            if f"{key}.json" in data.files:
+                return _object_array([_untagged(value) for value in json.loads(data[f"{key}.json"].tobytes())])
+            return None
+
+        names = json.loads(data["names"].tobytes())
+        return {name: StoredColumn(array(f"{i}.values"), array(f"{i}.categories")) for i, name in enumerate(names)}
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """一時ファイルに書いてから置き換え、途中までしか書かれていないファイルを残さない。"""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _dependency_entries(manifest: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    エントリの生成に必要な、依存テーブルのエントリを集める。
+
+    子テーブルでは、シャードの親レコードの範囲と重なる親のエントリだけを対象にする。
+
+    Args:
+        manifest: マニフェスト
+        entry: 生成するエントリ
+
+    Returns:
+        依存テーブル名をキー、そのエントリのリストを値とする辞書
+    """
+    by_table = {table["table_name"]: table for table in manifest["tables"]}
+    schema = by_table[entry["table"]]["schema"]
+
+    def entries_of(table_name: str) -> List[Dict[str, Any]]:
+        return [manifest["entries"][i] for i in by_table[table_name]["entries"]]
+
+    needed = {}
+    if _is_child(schema):
+        needed[schema["parent"]] = [
+            e for e in entries_of(schema["parent"])
+            if e["row_offset"] < entry["stop"] and entry["start"] < e["row_offset"] + e["rows"]
+        ]
+    if "source_table" in schema:
+        needed[schema["source_table"]] = entries_of(schema["source_table"])
+    for field_def in schema.get("fields", {}).values():
+        if isinstance(field_def, dict) and field_def.get("type") == "ref" and field_def["table"] != schema.get("parent"):
+            needed[field_def["table"]] = entries_of(field_def["table"])
+    return needed
+
+
+def _wait_for(directory: Path, seed: int, entries: Iterable[Dict[str, Any]], timeout: float) -> None:
+    """
+    エントリの完了マーカーがそろうまで待つ。
+
+    Args:
+        directory: 共有ディレクトリ
+        seed: 乱数のシード
+        entries: 待つエントリ
+        timeout: 最大の待ち時間（秒）。0 の場合は待たずに確認だけする
+    """
+    entries = list(entries)
+    deadline = time.monotonic() + timeout
+    while True:
+        missing = [e["id"] for e in entries if not marker_path(directory, _entry_shard(e, seed)).exists()]
+        if not missing:
+            return
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"[ERROR] 依存するシャードが完了していません: {missing}")
+        time.sleep(0.5)
+
+
+def _load_kept(directory: Path, seed: int, entries: List[Dict[str, Any]],
+               names: Optional[Iterable[str]] = None) -> Dict[str, Sequence]:
+    """
+    依存テーブルのエントリが保存した列を読み込み、エントリ順に連結する。
+
+    Args:
+        directory: 共有ディレクトリ
+        seed: 乱数のシード
+        entries: 読み込むエントリ（行の順）
+        names: 読み込む列名（省略時はすべての列）
+
+    Returns:
+        列名をキーとする列の辞書
+    """
+    chunks = []
+    for entry in entries:
+        path = kept_path(directory, _entry_shard(entry, seed))
+        if not path.exists():
+            continue
+        columns = load_kept(path)
+        chunks.append({name: columns[name].decode() for name in (columns if names is None else names)})
+    return concat_columns(chunks)
+
+
+def run_manifest_entry(manifest_path: Path, entry_id: int, wait: float = 0.0) -> int:
+    """
+    マニフェストのエントリを1つ生成し、パートファイル・後続用の列・完了マーカーを書き出す。
+
+    依存テーブルのデータは、共有ディレクトリにある依存エントリの保存列から読み込む。
+    完了マーカーは最後に書くため、マーカーがあるエントリの出力はそろっている。
+
+    Args:
+        manifest_path: マニフェストのパス（出力はマニフェストと同じディレクトリに書く）
+        entry_id: エントリ番号
+        wait: 依存エントリの完了を待つ最大の秒数
+
+    Returns:
+        書き出した行数
+    """
+    manifest = load_manifest(manifest_path)
+    directory = manifest_path.parent
+    seed = manifest["seed"]
+    entry = manifest["entries"][entry_id]
+    table = next(t for t in manifest["tables"] if t["table_name"] == entry["table"])
+    schema = table["schema"]
+    shard = _entry_shard(entry, seed)
+
+    needed = _dependency_entries(manifest, entry)
+    _wait_for(directory, seed, chain.from_iterable(needed.values()), wait)
+
+    tables = {}
+    if _is_child(schema):
+        parent_entries = needed[schema["parent"]]
+        first = parent_entries[0]["row_offset"] if parent_entries else shard.start
+        parents = ColumnTable(_load_kept(directory, seed, parent_entries))
+        tables[schema["parent"]] = parents.slice(shard.start - first, shard.stop - first)
+        shard = shard._replace(parent_offset=shard.start)
+    if "source_table" in schema:
+        tables[schema["source_table"]] = ColumnTable(_load_kept(directory, seed, needed[schema["source_table"]]))
+    pools = {}
+    for field_def in schema.get("fields", {}).values():
+        if isinstance(field_def, dict) and field_def.get("type") == "ref" and field_def["table"] != schema.get("parent"):
+            key = (field_def["table"], field_def["field"])
+            if key not in pools:
+                pools[key] = encode_column(_load_kept(directory, seed, needed[key[0]], [key[1]]).get(key[1], []))
+
+    keep = None if table["keep"] is None else set(table["keep"])
+    types = resolve_column_types([t["schema"] for t in manifest["tables"]])
+    job = TableJob(schema, keep, set(table["pool_fields"]), table["retain"], types[entry["table"]])
+    settings = RunSettings(directory, manifest["chunk_size"], seed, datetime.fromisoformat(manifest["as_of"]),
+                           manifest["shard_size"], manifest_output(manifest))
+    rows, names, kept, _ = _run_shard_in_worker(job, settings, shard, tables, pools)
+
+    if kept:
+        # 列は符号化した配列のまま保存する（共有ディレクトリのファイルを pickle で読み込まないよう npz にする）
+        _write_atomic(kept_path(directory, shard), dump_kept(ColumnTable(kept).columns))
+    marker = {"rows": rows, "names": names}
+    _write_atomic(marker_path(directory, shard), json.dumps(marker, ensure_ascii=False).encode("utf-8"))
+    return rows
+
+
+def finalize_manifest(manifest_path: Path, output_dir: Optional[Path] = None) -> Dict[str, int]:
+    """
+    全エントリの完了を確認し、テーブルごとにパートファイルをマニフェストの出力形式で連結する。
+
+    完了マーカーの行数がマニフェストの行数と一致しない場合や、列名がそろわない場合はエラーにする。
+    連結後はパートファイル・保存列・完了マーカーを削除する。
+
+    Args:
+        manifest_path: マニフェストのパス
+        output_dir: 出力先（省略時はマニフェストと同じディレクトリ）
+
+    Returns:
+        テーブル名をキーとする行数の辞書
+    """
+    manifest = load_manifest(manifest_path)
+    output = manifest_output(manifest)
+    directory = manifest_path.parent
+    output_dir = output_dir or directory
+    seed = manifest["seed"]
+    _wait_for(directory, seed, manifest["entries"], 0)
+
+    markers = {}
+    for entry in manifest["entries"]:
+        with open(marker_path(directory, _entry_shard(entry, seed)), encoding="utf-8") as f:
+            marker = markers[entry["id"]] = json.load(f)
+        if entry["rows"] is not None and marker["rows"] != entry["rows"]:
+            raise ValueError(
+                f"[ERROR] シャード {entry['id']} ({entry['table']}) の行数が一致しません: "
+                f"想定 {entry['rows']}, 実際 {marker['rows']}"
+            )
+
+    counts = {}
+    types = resolve_column_types([table["schema"] for table in manifest["tables"]])
+    for table in manifest["tables"]:
+        entries = [manifest["entries"][i] for i in table["entries"]]
+        names = [markers[e["id"]]["names"] for e in entries if markers[e["id"]]["names"]]
+        if any(n != names[0] for n in names):
+            raise ValueError(f"[ERROR] テーブル {table['table_name']} のシャード間で列がそろっていません")
+        shards = [_entry_shard(e, seed) for e in entries]
+        table_types = types[table["table_name"]]
+        names = names[0] if names else list(table_types)
+        output.merge(output_dir / f"{table['table_name']}{output.suffix}", names,
+                     [part_path(directory, shard, output.suffix) for shard in shards], table_types, table["schema"])
+        for shard in shards:
+            for path in (kept_path(directory, shard), marker_path(directory, shard)):
+                if path.exists():
+                    path.unlink()
+        counts[table["table_name"]] = sum(markers[e["id"]]["rows"] for e in entries)
+    return counts
+
+
+def plan_command(argv: List[str]) -> None:
+    """`plan` コマンド: スキーマを分割したマニフェストを共有ディレクトリに書き出す。"""
+    parser = argparse.ArgumentParser(prog="generator.py plan", description="分散生成用のマニフェストを作る")
+    parser.add_argument("directory", type=Path, help="マニフェストと出力を置く共有ディレクトリ")
+    parser.add_argument("--schema-dir", type=Path, default=Path("schema"), help="スキーマディレクトリ")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="1チャンクあたりの目安の行数")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="1シャードあたりの目安の行数")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード（省略時は実行ごとに決める）")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="日付の基準日時（`now` / `today` として扱う。例: 2025-04-01T00:00:00）")
+    parser.add_argument("--format", choices=tuple(MANIFEST_FORMATS), default="csv", help="出力形式（既定の設定で書き出す）")
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and pq is None:
+        parser.error("--format parquet には pyarrow が必要です（pip install pyarrow）")
+
+    seed = args.seed if args.seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+    as_of = args.as_of or datetime.now().replace(microsecond=0)
+    manifest = plan_manifest(load_schemas(args.schema_dir), seed, as_of, args.shard_size, args.chunk_size, args.format)
+    args.directory.mkdir(parents=True, exist_ok=True)
+    path = args.directory / "manifest.json"
+    write_manifest(path, manifest)
+    print(f"[INFO] manifest: {path} ({len(manifest['entries'])} shards, seed: {seed})")
+
+
+def run_shard_command(argv: List[str]) -> None:
+    """`run-shard` コマンド: マニフェストのエントリを生成する。"""
+    parser = argparse.ArgumentParser(prog="generator.py run-shard", description="マニフェストのシャードを生成する")
+    parser.add_argument("manifest", type=Path, help="マニフェストのパス")
+    parser.add_argument("ids", type=int, nargs="*", help="生成するエントリ番号")
+    parser.add_argument("--all", action="store_true", help="未完了のエントリをすべて順に生成する")
+    parser.add_argument("--wait", type=float, default=0.0, help="依存するシャードの完了を待つ最大の秒数")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    ids = args.ids
+    if args.all:
+        ids = [
+            e["id"] for e in manifest["entries"]
+            if not marker_path(args.manifest.parent, _entry_shard(e, manifest["seed"])).exists()
+        ]
+    for entry_id in ids:
+        if not 0 <= entry_id < len(manifest["entries"]):
+            parser.error(f"エントリ番号が範囲外です: {entry_id}（0〜{len(manifest['entries']) - 1}）")
+        entry = manifest["entries"][entry_id]
+        rows = run_manifest_entry(args.manifest, entry_id, args.wait)
+        print(f"[INFO] shard {entry_id} ({entry['table']} #{entry['index']}): {rows} rows")
+
+
+def finalize_command(argv: List[str]) -> None:
+    """`finalize` コマンド: 全シャードの完了を確認し、テーブルごとのファイルに連結する。"""
+    parser = argparse.ArgumentParser(prog="generator.py finalize", description="シャードを検証して連結する")
+    parser.add_argument("manifest", type=Path, help="マニフェストのパス")
+    parser.add_argument("--output-dir", type=Path, default=None, help="出力先（省略時はマニフェストと同じディレクトリ）")
+    args = parser.parse_args(argv)
+
+    if args.output_dir is not None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+    for table_name, rows in finalize_manifest(args.manifest, args.output_dir).items():
+        print(f"[INFO] {table_name}: {rows} rows")
+
+
+COMMANDS = {
+    "plan": plan_command,
+    "run-shard": run_shard_command,
+    "finalize": finalize_command,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    スキーマファイルを読み込み、順にデータを生成して CSV（--format で Parquet / SQL / バイナリ COPY / JSON Lines も選べる）に出力するメイン関数。
+
+    後続のテーブルから行単位で参照されないテーブルは、チャンク単位で生成しながら
+    ファイルに書き出し、ref プールに必要な列だけを残す。
+    各テーブルは --shard-size 件ずつのシャードに分けて生成する。--workers に 2 以上を指定すると、
+    依存関係の同じレベルにあるテーブルのシャードをプロセスプールで並列に生成し、
+    シャード順に連結する。出力はワーカー数によらず同じになる。
+
+    先頭の引数が plan / run-shard / finalize の場合は、マニフェストによる分散生成の各コマンドを実行する。
+
+    Args:
+        argv: コマンドライン引数（省略時は sys.argv）
+    """
+    global AS_OF
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+        return
+
+    parser = argparse.ArgumentParser(description="YAML スキーマからテストデータを生成する")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="1チャンクあたりの目安の行数")
+    parser.add_argument("--memory-report", action="store_true", help="テーブルごとに保持中のデータ量とメモリ使用量を表示する")
+    parser.add_argument("--workers", type=int, default=1, help="シャードを並列に生成するプロセス数")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="1シャードあたりの目安の行数")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード（指定すると同じ出力を再現できる）")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="日付の基準日時（`now` / `today` として扱う。例: 2025-04-01T00:00:00）")
+    parser.add_argument("--max-memory", type=parse_bytes, default=None,
+                        help="メモリ上に保持するデータ量の上限（例: 4G）。超えたテーブルはディスク上に保持する")
+    parser.add_argument("--format", choices=("csv", "parquet", "sql", "pgcopy", "jsonl", "none"), default="csv",
+                        help="出力形式（pgcopy は PostgreSQL のバイナリ COPY。none はファイルを書き出さない。--sqlite だけに出力する場合に使う）")
+    parser.add_argument("--sqlite", type=Path, default=None, help="出力と同時にデータを読み込む SQLite のデータベースファイル")
+    parser.add_argument("--sqlite-skip-duplicates", action="store_true",
+                        help="SQLite で主キーなどの制約に違反した行をエラーにせず、読み込まずに件数を表示する")
+    parser.add_argument("--csv-quoting", choices=CSV_QUOTINGS, default="all",
+                        help="CSV のクォート（all: すべての値、minimal: 必要な値だけ）")
+    parser.add_argument("--null-token", default=None, help="CSV で null を表す文字列（例: \\N）。省略時は空文字列")
+    parser.add_argument("--line-ending", choices=tuple(CSV_LINE_ENDINGS), default="crlf", help="CSV の改行コード")
+    parser.add_argument("--compression", choices=PARQUET_COMPRESSIONS, default=None,
+                        help="圧縮方式（CSV / SQL / pgcopy / JSONL: gzip / zstd、既定は圧縮なし。Parquet: 既定は snappy）")
+    parser.add_argument("--compression-level", type=int, default=None, help="圧縮レベル（省略時は圧縮方式の既定値）")
+    parser.add_argument("--compression-threads", type=int, default=None, help="CSV / SQL / pgcopy / JSONL の圧縮に使うスレッド数（省略時は CPU 数）")
+    parser.add_argument("--writer-queue", type=int, default=WRITE_QUEUE_DEPTH,
+                        help="書き出しスレッドに渡すキューの上限（チャンク数）。0 の場合は生成と同じスレッドで書き出す")
+    parser.add_argument("--stage-report", action="store_true",
+                        help="テーブルごとに生成・変換・書き出しの所要時間と、重ねて短縮できた時間を表示する")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE, help="Parquet の1行グループあたりの行数")
+    parser.add_argument("--sql-mode", choices=SQL_MODES, default="insert",
+                        help="SQL の行の書き方（insert: 複数行の INSERT 文、copy: PostgreSQL の COPY ... FROM stdin）")
+    parser.add_argument("--sql-batch-size", type=int, default=SQL_BATCH_SIZE, help="SQL の1つの INSERT 文にまとめる行数")
+    parser.add_argument("--nest-children", action="store_true",
+                        help="jsonl で、子テーブルの行を親テーブルのドキュメントに配列として埋め込む")
+    args = parser.parse_args(argv)
+    if args.sqlite_skip_duplicates and args.sqlite is None:
+        parser.error("--sqlite-skip-duplicates は --sqlite と組み合わせて指定してください")
+    if args.nest_children and args.format != "jsonl":
+        parser.error("--nest-children は --format jsonl と組み合わせて指定してください")
+    if args.format == "parquet":
+        if pq is None:
+            parser.error("--format parquet には pyarrow が必要です（pip install pyarrow）")
+        output = ParquetOutput(args.compression or "snappy", args.row_group_size, args.compression_level, args.writer_queue)
+    elif args.format == "none":
+        output = NullOutput()
+    else:
+        compression = None if args.compression in (None, "none") else args.compression
+        if compression is not None and compression not in CSV_COMPRESSIONS:
+            parser.error(f"{args.format.upper()} の --compression には {' / '.join(CSV_COMPRESSIONS)} を指定してください")
+        if compression == "zstd" and zstandard is None:
+            parser.error("--compression zstd には zstandard が必要です（pip install zstandard）")
+        if args.format == "sql":
+            output = SqlDumpOutput(args.sql_mode, args.sql_batch_size, compression, args.compression_level,
+                                   args.compression_threads, args.writer_queue)
+        elif args.format == "pgcopy":
+            output = PgBinaryOutput(compression, args.compression_level, args.compression_threads, args.writer_queue)
+        elif args.format == "jsonl":
+            output = JsonlOutput(compression, args.compression_level, args.compression_threads, args.writer_queue)
+        else:
+            output = CsvOutput(args.csv_quoting, args.null_token, CSV_LINE_ENDINGS[args.line_ending],
+                               compression, args.compression_level, args.compression_threads, args.writer_queue)
+
+    output_dir = Path("output")
+    output_dir.mkdir(exist_ok=True)
+    schemas = load_schemas(Path("schema"))
+
+    AS_OF = args.as_of or AS_OF or datetime.now().replace(microsecond=0)
+    seed = args.seed
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+        print(f"[INFO] seed: {seed}")
+    sqlite = None if args.sqlite is None else SqliteTarget(args.sqlite, args.sqlite_skip_duplicates)
+    ordered = resolve_dependencies(schemas)
+    for pattern, tables in shared_sequences(ordered).items():
+        print(f"[WARN] 連番のパターン {pattern} を複数のテーブル（{', '.join(tables)}）で使っています。"
+              "連番はテーブルごとに 1 から始まるため、同じ値が出力されます")
+    nest = None
+    if args.nest_children:
+        nest, skipped = nested_children(ordered)
+        for table_name, parent in skipped:
+            print(f"[WARN] {table_name}: {parent} には埋め込めないため、埋め込まずに出力します")
+    settings = RunSettings(output_dir, args.chunk_size, seed, AS_OF, args.shard_size, output, sqlite, nest)
+    jobs = build_jobs(ordered, nest)
+    releases = release_schedule(ordered)
+
+    def finish(table_name: str, table: Optional[ColumnTable], pools: Dict[str, StoredColumn]) -> None:
+        if table is not None:
+            DATA[table_name] = table
+        for field, pool in pools.items():
+            REF_POOLS[(table_name, field)] = pool
+
+    def report_stages(timings: StageTimes) -> None:
+        if args.stage_report:
+            print(f"[INFO]   stages: {timings.summary()}")
+
+    def report() -> None:
+        if args.memory_report:
+            current, peak = memory_usage()
+            print(
+                f"[INFO]   retained: {_format_bytes(retained_bytes())} ({', '.join(retained_tables()) or '-'}), "
+                f"rss: {_format_bytes(current)}, peak rss: {_format_bytes(peak)}"
+            )
+
+    # 並列生成では、後続のテーブルが使う列をメモリマップしたファイルに置き、ワーカーにはファイルの位置だけを渡す。
+    # --max-memory を超えたテーブルの列も、同じ置き場に書き出して保持する
+    mapped = MappedColumns(output_dir) if args.workers > 1 or args.max_memory is not None else None
+
+    def retain(table_name: str, table: Optional[ColumnTable], pools: Dict[str, StoredColumn],
+               kept: Union[List[Dict[str, Sequence]], TableBuilder]) -> None:
+        if isinstance(kept, TableBuilder) and kept.spilled:
+            print(f"[INFO]   {table_name}: --max-memory を超えたため、ディスク上に保持します")
+        if args.workers > 1:
+            if table is not None:
+                table = mapped.publish_table(table)
+                pools = {field: table.columns[field] for field in pools}
+            else:
+                pools = {field: mapped.publish(pool) for field, pool in pools.items()}
+        finish(table_name, table, pools)
+
+    def new_kept() -> Union[List[Dict[str, Sequence]], TableBuilder]:
+        return [] if args.max_memory is None else TableBuilder(args.max_memory, mapped)
+
+    try:
+        if args.workers <= 1:
+            plans = compile_schemas(ordered)
+            for schema in ordered:
+                table_name = schema["table_name"]
+                print(f"[INFO] Generating table: {table_name}")
+                kept = new_kept()
+                timings = StageTimes()
+                retain(table_name, *run_table(jobs[table_name], settings, plans[table_name], kept, timings), kept)
+                report_stages(timings)
+                for released in releases.get(table_name, ()):
+                    release_table(released)
+                report()
+            return
+
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for level in dependency_levels(ordered):
+                submitted = {}
+                for schema in level:
+                    table_name = schema["table_name"]
+                    print(f"[INFO] Generating table: {table_name}")
+                    job = jobs[table_name]
+                    shards = plan_shards(schema, seed, settings.shard_size)
+                    futures = []
+                    for shard in shards:
+                        inputs = _job_inputs(schema, shard)
+                        if _is_child(schema):
+                            shard = shard._replace(parent_offset=shard.start)
+                        futures.append(executor.submit(_run_shard_in_worker, job, settings, shard, *inputs))
+                    submitted[table_name] = (job, shards, futures)
 
-        if rows:
-            with open(output_dir / f"{table_name}.csv", "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(
-                    f,
-                    fieldnames=rows[0].keys(),
-                    quoting=csv.QUOTE_ALL
-                )
-                writer.writeheader()
-                writer.writerows(rows)
+                for table_name, (job, shards, futures) in submitted.items():
+                    kept = new_kept()
+                    names = list(job.types or ())
+                    timings = StageTimes()
+                    for future in futures:
+                        _, part_names, part_kept, part_timings = future.result()
+                        names = names or part_names
+                        timings.add(part_timings)
+                        if part_kept:
+                            kept.append(part_kept)
+                    table_output, file_name = output_for(job, settings)
+                    table_output.merge(output_dir / f"{file_name}{table_output.suffix}", names,
+                                       [part_path(output_dir, shard, table_output.suffix) for shard in shards], job.types, job.schema)
+                    if sqlite is not None:
+                        sqlite.merge(job, shards)
+                    retain(table_name, *_retained(job, kept), kept)
+                    report_stages(timings)
+                for table_name in submitted:
+                    for released in releases.get(table_name, ()):
+                        release_table(released)
+                report()
+    finally:
+        if mapped is not None:
+            mapped.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generator  # noqa: E402
+
+
+@pytest.fixture
+def run_generator(tmp_path, monkeypatch):
+    """
+    スキーマを書いた作業ディレクトリで generator.main を実行し、出力ファイルの中身を返す関数。
+
+    Returns:
+        (スキーマのリスト, コマンドライン引数) を受け取り、ファイル名をキーとするバイト列の辞書を返す関数
+    """
+    monkeypatch.chdir(tmp_path)
+    runs = iter(range(1000))
+
+    def run(schemas: List[dict], *args: str) -> Dict[str, bytes]:
+        work = tmp_path / f"run{next(runs)}"
+        (work / "schema").mkdir(parents=True)
+        for schema in schemas:
+            (work / "schema" / f"{schema['table_name']}.yaml").write_text(yaml.safe_dump(schema, allow_unicode=True),
+                                                                         encoding="utf-8")
+        monkeypatch.chdir(work)
+        generator.DATA.clear()
+        generator.REF_POOLS.clear()
+        generator.main(["--seed", "1", "--as-of", "2025-01-01T00:00:00", *args])
+        return {path.name: path.read_bytes() for path in sorted((work / "output").iterdir()) if path.is_file()}
+
+    return run
@@ -0,0 +1,38 @@
+import pytest
+
+import generator
+
+SCHEMAS = [
+    {"table_name": "p", "type": "transactional", "count": 400, "fields": {"no": {"type": "code"}, "n": {"type": "int"}}},
+    {
+        "table_name": "c",
+        "type": "transactional",
+        "parent": "p",
+        "parent_key": "no",
+        "count_per_parent": "1~3",
+        "fields": {"no": {"type": "ref", "table": "p", "field": "no"}, "line": {"type": "auto_increment"}},
+    },
+]
+
+
+def test_contains_does_not_decode_columns(monkeypatch):
+    table = generator.ColumnTable({"a": ["x", "y"], "b": [1, 2]})
+    monkeypatch.setattr(generator.StoredColumn, "decode", lambda self: pytest.fail("列全体を元に戻しました"))
+    assert "a" in table
+    assert "z" not in table
+
+
+def test_child_chunks_do_not_decode_whole_parent_columns(run_generator, monkeypatch):
+    calls = []
+    decode = generator.StoredColumn.decode
+
+    def counted(self):
+        calls.append(len(self))
+        return decode(self)
+
+    monkeypatch.setattr(generator.StoredColumn, "decode", counted)
+    expected = run_generator(SCHEMAS, "--chunk-size", "1000")
+    large = len(calls)
+    calls.clear()
+    assert run_generator(SCHEMAS, "--chunk-size", "5") == expected
+    assert len(calls) == large
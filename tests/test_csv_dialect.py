@@ -0,0 +1,35 @@
+import csv
+import io
+
+import pytest
+
+RECORDS = [
+    {"a": "x,y", "b": 1},
+    {"a": 'say "hi"', "b": None},
+    {"a": "line\nbreak", "b": 2},
+    {"a": "", "b": 3},
+]
+SCHEMAS = [
+    {"table_name": "r", "type": "master", "records": RECORDS},
+    {"table_name": "one", "type": "master", "records": [{"a": "x"}, {"a": ""}]},
+]
+
+
+@pytest.mark.parametrize("args, expected", [
+    ((), b'"a","b"\r\n"x,y","1"\r\n"say ""hi""",""\r\n"line\nbreak","2"\r\n"","3"\r\n'),
+    (("--null-token", r"\N"), b'"a","b"\r\n"x,y","1"\r\n"say ""hi""",\\N\r\n"line\nbreak","2"\r\n"","3"\r\n'),
+    (("--csv-quoting", "minimal", "--null-token", r"\N", "--line-ending", "lf"),
+     b'a,b\n"x,y",1\n"say ""hi""",\\N\n"line\nbreak",2\n,3\n'),
+])
+def test_quoting_null_and_line_ending(run_generator, args, expected):
+    assert run_generator(SCHEMAS, *args)["r.csv"] == expected
+
+
+def test_minimal_quoting_round_trips(run_generator):
+    data = run_generator(SCHEMAS, "--csv-quoting", "minimal", "--line-ending", "lf")["r.csv"].decode("utf-8")
+    rows = list(csv.reader(io.StringIO(data, newline="")))
+    assert rows == [["a", "b"]] + [[record["a"], "" if record["b"] is None else str(record["b"])] for record in RECORDS]
+
+
+def test_minimal_quoting_keeps_empty_rows_of_a_single_column(run_generator):
+    assert run_generator(SCHEMAS, "--csv-quoting", "minimal", "--line-ending", "lf")["one.csv"] == b'a\nx\n""\n'
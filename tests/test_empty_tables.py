@@ -0,0 +1,23 @@
+import pytest
+
+SCHEMAS = [
+    {"table_name": "p", "type": "transactional", "count": 0, "fields": {"id": {"type": "code"}, "n": {"type": "int"}}},
+    {
+        "table_name": "c",
+        "type": "transactional",
+        "parent": "p",
+        "parent_key": "id",
+        "count_per_parent": "1~2",
+        "fields": {"id": {"type": "ref", "table": "p", "field": "id"}, "line": {"type": "auto_increment"}},
+    },
+    {"table_name": "r", "type": "master", "count": 0, "fields": {"p_id": {"type": "ref", "table": "p", "field": "id"}}},
+    {"table_name": "ptr", "type": "pointer", "source_table": "p", "key": ["id"], "latest_field": "n"},
+]
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2"), ("--max-memory", "1K")])
+def test_children_and_refs_of_an_empty_table(run_generator, args):
+    output = run_generator(SCHEMAS, *args)
+    assert output["p.csv"] == b'"id","n"\r\n'
+    assert output["c.csv"] == b'"id","line"\r\n'
+    assert output["r.csv"] == b'"p_id"\r\n'
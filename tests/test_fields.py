@@ -0,0 +1,93 @@
+import uuid
+
+import pytest
+
+import generator
+
+
+def test_generate_value_reuses_compiled_plan():
+    generator._field_plan.cache_clear()
+    values = [generator.generate_value("id", {"type": "uuid"}, {}) for _ in range(3)]
+    assert generator._field_plan.cache_info().currsize == 1
+    assert len(set(values)) == 3
+    assert all(uuid.UUID(value).version == 4 for value in values)
+
+    generator.generate_value("tags", {"type": "choice", "values": ["a", "b"]}, {})
+    generator.generate_value("tags", {"type": "choice", "values": ["a", "b"]}, {})
+    assert generator._field_plan.cache_info().currsize == 2
+    assert generator._field_plan.cache_info().maxsize == generator.FIELD_PLAN_CACHE_SIZE
+
+
+def test_generate_value_follows_replaced_ref_tables(monkeypatch):
+    monkeypatch.setattr(generator, "DATA", {})
+    monkeypatch.setattr(generator, "REF_POOLS", {})
+    field_def = {"type": "ref", "table": "loc", "field": "id"}
+    generator.DATA["loc"] = generator.ColumnTable({"id": ["A"] * 4})
+    assert generator.generate_value("loc", field_def, {}) == "A"
+    generator.DATA["loc"] = generator.ColumnTable({"id": ["B"] * 4})
+    assert generator.generate_value("loc", field_def, {}) == "B"
+
+
+AS_OF = generator.datetime(2025, 1, 1, 12, 0, 0)
+DAY = 86400
+
+
+@pytest.mark.parametrize("spec, seconds", [
+    ("now", 0),
+    ("today", 0),
+    ("-1y", -365.25 * DAY),
+    ("-1y6M", -(365.25 + 6 * 30.42) * DAY),
+    ("+2h", 2 * 3600),
+    ("-2w", -14 * DAY),
+    ("-30m", -30 * 60),
+    ("-1M", -30.42 * DAY),
+    ("+1d-12h", 12 * 3600),
+    ("45s", 45),
+])
+def test_relative_anchors(spec, seconds):
+    assert generator.resolve_anchor(spec, AS_OF) == AS_OF + generator.timedelta(seconds=seconds)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("2024-01-01", generator.datetime(2024, 1, 1)),
+    ("2024-01-01T09:30:15", generator.datetime(2024, 1, 1, 9, 30, 15)),
+    (generator.date(2024, 2, 29), generator.datetime(2024, 2, 29)),
+    (generator.datetime(2024, 2, 29, 8), generator.datetime(2024, 2, 29, 8)),
+])
+def test_absolute_anchors(spec, expected):
+    assert generator.resolve_anchor(spec, AS_OF) == expected
+
+
+@pytest.mark.parametrize("spec", ["yesterday", "-1x", "1y-", "-y", "2024-13-01", ""])
+def test_malformed_anchors_are_rejected(spec):
+    with pytest.raises(ValueError, match="日付の指定を解釈できません"):
+        generator.resolve_anchor(spec, AS_OF)
+
+
+def days(text):
+    return int(generator.np.datetime64(text, "D").astype(generator.np.int64))
+
+
+def test_date_range_uses_the_run_as_of_by_default(monkeypatch):
+    monkeypatch.setattr(generator, "AS_OF", AS_OF)
+    assert generator.resolve_date_range({"type": "date", "start": "-1w"}, "D") == (days("2024-12-25"), days("2025-01-01"))
+
+
+def test_date_range_with_field_as_of():
+    field_def = {"type": "timestamp", "start": "-1h", "end": "+30m", "as_of": "2024-03-01T10:00:00"}
+    low, high = generator.resolve_date_range(field_def, "s")
+    epoch = generator.datetime(1970, 1, 1)
+    assert low == (generator.datetime(2024, 3, 1, 9) - epoch).total_seconds()
+    assert high == (generator.datetime(2024, 3, 1, 10, 30) - epoch).total_seconds()
+
+
+def test_date_range_rejects_start_after_end():
+    with pytest.raises(ValueError, match="start が end より後"):
+        generator.resolve_date_range({"type": "date", "start": "2024-02-01", "end": "2024-01-01"}, "D")
+
+
+def test_date_column_stays_within_range(monkeypatch):
+    monkeypatch.setattr(generator, "AS_OF", AS_OF)
+    plan = generator.compile_field("d", {"type": "date", "start": "2024-02-27", "end": "2024-03-02"})
+    values = set(plan.generate_column(200))
+    assert values == {"2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01", "2024-03-02"}
@@ -0,0 +1,61 @@
+import csv
+import io
+
+import pytest
+
+import generator
+
+SCHEMAS = [
+    {"table_name": "loc", "type": "master", "count": 5, "fields": {"id": {"type": "code"}}},
+    {
+        "table_name": "order",
+        "type": "transactional",
+        "count": 20,
+        "fields": {"no": {"type": "code"}, "loc": {"type": "ref", "table": "loc", "field": "id"}, "qty": {"type": "int"}},
+    },
+    {
+        "table_name": "line",
+        "type": "transactional",
+        "parent": "order",
+        "parent_key": "no",
+        "count_per_parent": "0~3",
+        "fields": {
+            "no": {"type": "ref", "table": "order", "field": "no"},
+            "line": {"type": "auto_increment"},
+            "q": {"type": "int", "nullable": True},
+        },
+    },
+    {"table_name": "ptr", "type": "pointer", "source_table": "order", "key": ["loc"], "latest_field": "qty"},
+    {"table_name": "kind", "type": "master", "records": [{"k": "a", "n": 1}, {"k": "b", "n": None}]},
+]
+
+
+def texts(rows):
+    return [{name: "" if value is None else str(value) for name, value in row.items()} for row in rows]
+
+
+def test_row_range_builds_ref_tables_on_demand(run_generator):
+    output = run_generator(SCHEMAS)
+    expected = list(csv.DictReader(io.StringIO(output["order.csv"].decode("utf-8"))))[10:15]
+
+    generator.DATA.clear()
+    generator.REF_POOLS.clear()
+    rows = generator.generate_rows(SCHEMAS[1], rows=range(10, 15), seed=1, schemas=SCHEMAS)
+    assert texts(rows) == expected
+
+
+@pytest.mark.parametrize("table_name", ["line", "ptr", "kind"])
+def test_seed_without_rows_generates_the_whole_table(run_generator, table_name):
+    output = run_generator(SCHEMAS)
+    expected = list(csv.DictReader(io.StringIO(output[f"{table_name}.csv"].decode("utf-8"))))
+    assert expected
+
+    generator.DATA.clear()
+    generator.REF_POOLS.clear()
+    schema = next(schema for schema in SCHEMAS if schema["table_name"] == table_name)
+    assert texts(generator.generate_rows(schema, seed=1, schemas=SCHEMAS)) == expected
+
+
+def test_row_range_of_a_child_table_is_rejected():
+    with pytest.raises(ValueError):
+        generator.generate_rows(SCHEMAS[2], rows=range(0, 5), seed=1, schemas=SCHEMAS)
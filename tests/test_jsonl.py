@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+import pytest
+
+import generator
+
+SCHEMAS = [
+    {"table_name": "p", "type": "transactional", "count": 12, "fields": {"id": {"type": "code"}, "n": {"type": "int"}}},
+    {
+        "table_name": "c",
+        "type": "transactional",
+        "parent": "p",
+        "parent_key": "id",
+        "count_per_parent": "0~3",
+        "fields": {
+            "id": {"type": "ref", "table": "p", "field": "id"},
+            "line": {"type": "auto_increment"},
+            "q": {"type": "int", "nullable": True},
+        },
+    },
+]
+
+
+def csv_rows(data):
+    """CSV を、int の列を数値・null トークンを None に戻した辞書のリストにする。"""
+    rows = csv.DictReader(io.StringIO(data.decode("utf-8")))
+    return [{k: None if v == r"\N" else int(v) if k in ("n", "line", "q") else v for k, v in row.items()} for row in rows]
+
+
+def documents(data):
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+@pytest.fixture
+def expected(run_generator):
+    output = run_generator(SCHEMAS, "--null-token", r"\N")
+    return csv_rows(output["p.csv"]), csv_rows(output["c.csv"])
+
+
+@pytest.mark.parametrize("json_module", ["orjson", "json"])
+def test_flat_lines_match_csv(run_generator, expected, monkeypatch, json_module):
+    if json_module == "json":
+        monkeypatch.setattr(generator, "orjson", None)
+    output = run_generator(SCHEMAS, "--format", "jsonl")
+    assert documents(output["p.jsonl"]) == expected[0]
+    assert documents(output["c.jsonl"]) == expected[1]
+    assert any(row["q"] is None for row in expected[1])
+
+
+@pytest.mark.parametrize("args", [(), ("--chunk-size", "2"), ("--workers", "2", "--shard-size", "5")])
+def test_children_are_nested_in_parent_documents(run_generator, expected, args):
+    output = run_generator(SCHEMAS, "--format", "jsonl", "--nest-children", *args)
+    assert sorted(output) == ["p.jsonl"]
+    docs = documents(output["p.jsonl"])
+    assert [{k: v for k, v in doc.items() if k != "c"} for doc in docs] == expected[0]
+    assert [child for doc in docs for child in doc["c"]] == expected[1]
+    assert all(child["id"] == doc["id"] for doc in docs for child in doc["c"])
+    assert any(doc["c"] == [] for doc in docs)
+
+
+def test_children_that_cannot_be_nested_are_reported_by_main(run_generator, capsys):
+    second = dict(SCHEMAS[1], table_name="c2")
+    grandchild = dict(SCHEMAS[1], table_name="gc", parent="c", parent_key="line",
+                      fields={"line": {"type": "ref", "table": "c", "field": "line"}})
+    schemas = [*SCHEMAS, second, grandchild]
+
+    nest, skipped = generator.nested_children(generator.resolve_dependencies(schemas))
+    assert nest == {"c": "p"}
+    assert sorted(skipped) == [("c2", "p"), ("gc", "c")]
+    assert capsys.readouterr().out == ""
+
+    output = run_generator(schemas, "--format", "jsonl", "--nest-children")
+    assert sorted(output) == ["c2.jsonl", "gc.jsonl", "p.jsonl"]
+    out = capsys.readouterr().out
+    assert "[WARN] c2: p には埋め込めないため、埋め込まずに出力します" in out
+    assert "[WARN] gc: c には埋め込めないため、埋め込まずに出力します" in out
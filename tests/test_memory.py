@@ -0,0 +1,37 @@
+import re
+
+import pytest
+
+import generator
+
+SCHEMAS = [
+    {"table_name": "a", "type": "master", "count": 5, "fields": {"id": {"type": "code"}}},
+    {"table_name": "b", "type": "master", "count": 5,
+     "fields": {"id": {"type": "code", "pattern": "B{seq:3}"}, "a": {"type": "ref", "table": "a", "field": "id"}}},
+    {"table_name": "c", "type": "master", "count": 5, "fields": {"b": {"type": "ref", "table": "b", "field": "id"}}},
+    {"table_name": "d", "type": "master", "count": 5,
+     "fields": {"a": {"type": "ref", "table": "a", "field": "id"}, "c": {"type": "int"}}},
+]
+
+
+def test_release_schedule_frees_tables_after_their_last_consumer():
+    ordered = generator.resolve_dependencies(SCHEMAS)
+    order = [schema["table_name"] for schema in ordered]
+    schedule = generator.release_schedule(ordered)
+    released_after = {table: user for user, tables in schedule.items() for table in tables}
+    assert released_after["a"] == max("b", "d", key=order.index)
+    assert released_after["b"] == "c"
+    assert released_after["c"] == "c"
+    assert released_after["d"] == "d"
+
+
+@pytest.mark.parametrize("args, generated, retained", [
+    ((), ["a", "b", "c", "d"], ["a", "a, b", "a", "-"]),
+    # 並列生成では依存関係のレベル（a / b, d / c）ごとにまとめて解放・報告する
+    (("--workers", "2"), ["a", "b", "d", "c"], ["a", "b", "-"]),
+])
+def test_memory_report_shows_tables_until_their_last_consumer(run_generator, capsys, args, generated, retained):
+    run_generator(SCHEMAS, "--memory-report", *args)
+    out = capsys.readouterr().out
+    assert re.findall(r"\[INFO\] Generating table: (\w+)", out) == generated
+    assert re.findall(r"\[INFO\]   retained: [\d.]+ \w+ \((.*?)\), rss: .+, peak rss: .+", out) == retained
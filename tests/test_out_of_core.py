@@ -0,0 +1,35 @@
+import generator
+
+SCHEMAS = [
+    {"table_name": "p", "type": "transactional", "count": 3000, "fields": {"no": {"type": "code"}, "n": {"type": "int"}}},
+    {
+        "table_name": "c",
+        "type": "transactional",
+        "parent": "p",
+        "parent_key": "no",
+        "count_per_parent": "1~3",
+        "fields": {"no": {"type": "ref", "table": "p", "field": "no"}, "line": {"type": "auto_increment"}},
+    },
+]
+
+
+def test_spilled_parent_is_read_per_chunk(run_generator, monkeypatch):
+    mapped = {"decode": 0, "take": 0}
+    decode, take = generator.StoredColumn.decode, generator.StoredColumn.take
+
+    def counted_decode(self):
+        if generator._mapped_location(self.values) is not None:
+            mapped["decode"] += 1
+        return decode(self)
+
+    def counted_take(self, indices):
+        if generator._mapped_location(self.values) is not None:
+            mapped["take"] += 1
+        return take(self, indices)
+
+    expected = run_generator(SCHEMAS)
+    monkeypatch.setattr(generator.StoredColumn, "decode", counted_decode)
+    monkeypatch.setattr(generator.StoredColumn, "take", counted_take)
+    assert run_generator(SCHEMAS, "--max-memory", "1K", "--chunk-size", "100") == expected
+    assert mapped["take"] > 0
+    assert mapped["decode"] == 0
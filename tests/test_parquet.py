@@ -0,0 +1,35 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+SCHEMAS = [
+    {
+        "table_name": "t",
+        "type": "master",
+        "count": 50,
+        "fields": {"id": {"type": "code"}, "n": {"type": "int"}, "d": {"type": "date"}, "k": {"type": "const", "value": "x"}},
+    },
+    {"table_name": "e", "type": "master", "count": 0, "fields": {"id": {"type": "uuid"}, "n": {"type": "int"}}},
+]
+
+
+def read(data):
+    return pq.ParquetFile(pa.BufferReader(data))
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2", "--shard-size", "7"), ("--chunk-size", "3")])
+def test_row_groups_follow_row_group_size(run_generator, args):
+    expected = run_generator(SCHEMAS, "--format", "parquet")["t.parquet"]
+    source = read(run_generator(SCHEMAS, "--format", "parquet", "--row-group-size", "20", *args)["t.parquet"])
+    sizes = [source.metadata.row_group(i).num_rows for i in range(source.metadata.num_row_groups)]
+    assert sizes == [20, 20, 10]
+    assert source.read().equals(read(expected).read())
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2")])
+def test_empty_table_has_schema_only(run_generator, args):
+    source = read(run_generator(SCHEMAS, "--format", "parquet", *args)["e.parquet"])
+    assert source.metadata.num_rows == 0
+    assert source.schema_arrow.names == ["id", "n"]
+    assert source.schema_arrow.field("n").type == pa.int64()
@@ -0,0 +1,83 @@
+import csv
+import io
+import struct
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+SCHEMAS = [
+    {
+        "table_name": "t",
+        "type": "master",
+        "count": 40,
+        "fields": {
+            "id": {"type": "uuid"},
+            "n": {"type": "int", "min": -5, "max": 5},
+            "d": {"type": "date", "start": "1999-12-01", "end": "2000-02-01"},
+            "ts": {"type": "timestamp", "start": "2024-01-01", "end": "2024-12-31"},
+            "s": {"type": "code", "pattern": "S{seq:3}"},
+            "v": {"type": "int", "nullable": True},
+        },
+    },
+]
+
+KINDS = {"id": "uuid", "n": "int", "d": "date", "ts": "timestamp", "s": "string", "v": "int"}
+
+
+def decode(data, kinds):
+    """PGCOPY のバイト列を、CSV と同じ文字列表現の行のリストに戻す（null は None）。"""
+    assert data[:11] == b"PGCOPY\n\xff\r\n\x00"
+    flags, extension = struct.unpack(">ii", data[11:19])
+    assert flags == 0
+    pos = 19 + extension
+    rows = []
+    while True:
+        (count,) = struct.unpack(">h", data[pos:pos + 2])
+        pos += 2
+        if count == -1:
+            break
+        assert count == len(kinds)
+        row = []
+        for kind in kinds:
+            (size,) = struct.unpack(">i", data[pos:pos + 4])
+            pos += 4
+            if size == -1:
+                row.append(None)
+                continue
+            value = data[pos:pos + size]
+            pos += size
+            if kind == "int":
+                assert size == 8
+                row.append(str(struct.unpack(">q", value)[0]))
+            elif kind == "date":
+                assert size == 4
+                row.append((date(2000, 1, 1) + timedelta(days=struct.unpack(">i", value)[0])).isoformat())
+            elif kind == "timestamp":
+                assert size == 8
+                row.append((datetime(2000, 1, 1) + timedelta(microseconds=struct.unpack(">q", value)[0])).isoformat())
+            elif kind == "uuid":
+                assert size == 16
+                row.append(str(uuid.UUID(bytes=value)))
+            else:
+                row.append(value.decode("utf-8"))
+        rows.append(row)
+    assert pos == len(data)
+    return rows
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2", "--shard-size", "15")])
+def test_binary_copy_matches_csv(run_generator, args):
+    expected = list(csv.reader(io.StringIO(run_generator(SCHEMAS, "--null-token", r"\N")["t.csv"].decode("utf-8"))))
+    names = expected[0]
+    rows = decode(run_generator(SCHEMAS, "--format", "pgcopy", *args)["t.pgcopy"], [KINDS[name] for name in names])
+
+    assert [[r"\N" if value is None else value for value in row] for row in rows] == expected[1:]
+    assert any(row[names.index("v")] is None for row in rows)
+    assert any(row[names.index("d")] < "2000-01-01" for row in rows)
+
+
+def test_empty_table_is_header_and_trailer_only(run_generator):
+    schemas = [dict(SCHEMAS[0], count=0)]
+    data = run_generator(schemas, "--format", "pgcopy")["t.pgcopy"]
+    assert data == b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0) + struct.pack(">h", -1)
@@ -0,0 +1,57 @@
+import pytest
+
+SCHEMAS = [
+    {
+        "table_name": "slip",
+        "type": "transactional",
+        "count": 23,
+        "fields": {
+            "a": {"type": "code"},
+            "n": {"type": "int", "min": 0, "max": 9},
+            "b": {"type": "code"},
+            "c": {"type": "code", "pattern": "S{seq:3}-{alpha}-{seq:2}"},
+        },
+    },
+    {
+        "table_name": "line",
+        "type": "transactional",
+        "parent": "slip",
+        "parent_key": "a",
+        "count_per_parent": "0~3",
+        "fields": {
+            "a": {"type": "ref", "table": "slip", "field": "a"},
+            "x": {"type": "code", "pattern": "L{seq:4}"},
+            "y": {"type": "code", "pattern": "L{seq:4}"},
+        },
+    },
+]
+
+
+def test_same_pattern_code_fields_use_fixed_row_slots(run_generator):
+    output = run_generator(SCHEMAS)
+    lines = output["slip.csv"].decode().splitlines()
+    assert lines[1].startswith('"CODE-000001",')
+    assert ',"CODE-000002",' in lines[1]
+    assert lines[2].startswith('"CODE-000003",')
+
+
+@pytest.mark.parametrize("args", [
+    ("--workers", "3"),
+    ("--shard-size", "4"),
+    ("--chunk-size", "2"),
+    ("--workers", "3", "--shard-size", "4", "--chunk-size", "2"),
+])
+def test_output_does_not_depend_on_workers_shards_or_chunks(run_generator, args):
+    expected = run_generator(SCHEMAS, "--shard-size", "100", "--chunk-size", "100")
+    assert run_generator(SCHEMAS, *args) == expected
+
+
+def test_sequences_restart_for_each_table(run_generator, capsys):
+    schemas = [
+        {"table_name": name, "type": "master", "count": 3,
+         "fields": {"code": {"type": "code", "pattern": "X{seq:3}"}, "id": {"type": "auto_increment"}}}
+        for name in ("t1", "t2")
+    ]
+    output = run_generator(schemas, "--workers", "2")
+    assert output["t1.csv"] == output["t2.csv"] == b'"code","id"\r\n"X001","1"\r\n"X002","2"\r\n"X003","3"\r\n'
+    assert "[WARN] 連番のパターン X{seq:3} を複数のテーブル（t1, t2）で使っています" in capsys.readouterr().out
@@ -0,0 +1,58 @@
+import gzip
+import sqlite3
+
+import pytest
+
+RECORDS = [
+    {"id": 1, "name": "O'Reilly", "note": "tab\there"},
+    {"id": 2, "name": "back\\slash", "note": None},
+    {"id": 3, "name": "line\nbreak", "note": ""},
+]
+SCHEMAS = [
+    {"table_name": "r", "type": "master", "records": RECORDS},
+    {
+        "table_name": "t",
+        "type": "master",
+        "count": 25,
+        "primary_key": ["id"],
+        "fields": {
+            "id": {"type": "uuid"},
+            "d": {"type": "date"},
+            "ts": {"type": "timestamp"},
+            "n": {"type": "int", "nullable": True},
+        },
+    },
+]
+DDL = 'BEGIN;\nDROP TABLE IF EXISTS "r";\nCREATE TABLE "r" ("id" BIGINT NOT NULL, "name" TEXT NOT NULL, "note" TEXT);\n'
+
+
+def test_insert_statements_escape_quotes_and_nulls(run_generator):
+    assert run_generator(SCHEMAS, "--format", "sql", "--sql-batch-size", "2")["r.sql"].decode("utf-8") == (
+        DDL
+        + 'INSERT INTO "r" ("id", "name", "note") VALUES\n'
+        + "(1, 'O''Reilly', 'tab\there'),\n(2, 'back\\slash', NULL);\n"
+        + 'INSERT INTO "r" ("id", "name", "note") VALUES\n'
+        + "(3, 'line\nbreak', '');\nCOMMIT;\n"
+    )
+
+
+def test_copy_block_escapes_tabs_newlines_and_backslashes(run_generator):
+    assert run_generator(SCHEMAS, "--format", "sql", "--sql-mode", "copy")["r.sql"].decode("utf-8") == (
+        DDL
+        + 'COPY "r" ("id", "name", "note") FROM stdin;\n'
+        + "1\tO'Reilly\ttab\\there\n2\tback\\\\slash\t\\N\n3\tline\\nbreak\t\n\\.\nCOMMIT;\n"
+    )
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2", "--shard-size", "10", "--sql-batch-size", "7")])
+def test_insert_script_loads_the_same_rows_as_csv(run_generator, args):
+    csv_rows = run_generator(SCHEMAS, "--null-token", "NULL", "--csv-quoting", "minimal", "--line-ending", "lf")
+    script = gzip.decompress(run_generator(SCHEMAS, "--format", "sql", "--compression", "gzip", *args)["t.sql.gz"])
+    assert 'CREATE TABLE "t" ("d" DATE NOT NULL, "id" UUID NOT NULL, "n" BIGINT, "ts" TIMESTAMP NOT NULL, ' \
+           'PRIMARY KEY ("id"));' in script.decode("utf-8")
+
+    db = sqlite3.connect(":memory:", isolation_level=None)
+    db.executescript(script.decode("utf-8"))
+    loaded = ["d,id,n,ts"] + [",".join("NULL" if value is None else str(value) for value in row)
+                              for row in db.execute('SELECT * FROM "t"')]
+    assert "\n".join(loaded) + "\n" == csv_rows["t.csv"].decode("utf-8")
@@ -0,0 +1,28 @@
+import sqlite3
+
+import pytest
+
+SCHEMAS = [
+    {
+        "table_name": "t",
+        "type": "master",
+        "count": 20,
+        "primary_key": ["k"],
+        "fields": {"k": {"type": "int", "min": 1, "max": 3}, "n": {"type": "int"}},
+    },
+]
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2", "--shard-size", "5")])
+def test_primary_key_collisions_fail_by_default(run_generator, args):
+    with pytest.raises(ValueError, match="--sqlite-skip-duplicates"):
+        run_generator(SCHEMAS, "--sqlite", "output/data.sqlite", "--format", "none", *args)
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2", "--shard-size", "5")])
+def test_skip_duplicates_reports_dropped_rows(run_generator, capsys, args):
+    run_generator(SCHEMAS, "--sqlite", "output/data.sqlite", "--format", "none", "--sqlite-skip-duplicates", *args)
+    with sqlite3.connect("output/data.sqlite") as db:
+        loaded = db.execute("SELECT count(*) FROM t").fetchone()[0]
+    assert loaded == 3
+    assert f"[WARN]   t: 主キーの重複などの制約に違反した {20 - loaded} 行を SQLite に読み込みませんでした" in capsys.readouterr().out
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+import generator
+
+SCHEMAS = [
+    {"table_name": "p", "type": "transactional", "count": 60, "fields": {"no": {"type": "code"}, "d": {"type": "date"}}},
+    {
+        "table_name": "c",
+        "type": "transactional",
+        "parent": "p",
+        "parent_key": "no",
+        "count_per_parent": "0~3",
+        "fields": {"no": {"type": "ref", "table": "p", "field": "no"}, "q": {"type": "int", "nullable": True}},
+    },
+]
+
+
+def test_background_errors_reach_the_caller():
+    written = []
+
+    def sink(item):
+        if item == 2:
+            raise OSError("disk full")
+        written.append(item)
+
+    writer = generator.BackgroundWriter(sink, depth=1)
+    with pytest.raises(OSError, match="disk full"):
+        for item in range(100):
+            writer.write(item)
+        writer.close()
+    assert written == [0, 1]
+
+
+class FailingFile(io.BytesIO):
+    """2回目の書き込みで失敗するファイル。"""
+
+    def write(self, data):
+        if self.tell():
+            raise OSError("disk full")
+        return super().write(data)
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2", "--shard-size", "10")])
+def test_write_errors_fail_the_run(run_generator, monkeypatch, args):
+    monkeypatch.setattr(generator.StreamOutput, "_open", lambda self, path: FailingFile())
+    with pytest.raises(OSError, match="disk full"):
+        run_generator(SCHEMAS, "--chunk-size", "5", *args)
+
+
+@pytest.mark.parametrize("args", [
+    ("--chunk-size", "7"),
+    ("--chunk-size", "7", "--format", "jsonl", "--compression", "gzip"),
+    ("--chunk-size", "7", "--format", "parquet", "--row-group-size", "16"),
+    ("--workers", "2", "--shard-size", "10", "--format", "sql"),
+])
+def test_writer_queue_zero_matches_the_writer_thread(run_generator, args):
+    if "parquet" in args:
+        pytest.importorskip("pyarrow")
+    assert run_generator(SCHEMAS, "--writer-queue", "0", *args) == run_generator(SCHEMAS, *args)